@@ -34,18 +34,29 @@ def main(argv):
 
     # Reset the environment and show observation
     image, info = env.reset()
-    plt.figure(figsize=(5, 5))
-    plt.imshow(image)
+    fig = plt.figure(figsize=(5, 5))
+    # Create the image once and only update its pixels in each step. The image is
+    # animated, so it is left out of full figure redraws and drawn with `blit`.
+    image_artist = plt.imshow(image, animated=True)
     plt.ion()
     plt.show()
-
-    # Randomly take 10 actions and show observation
-    for _ in range(10):
-        rets = env.step(np.random.randint(NUM_ACTIONS))
+    plt.pause(0.1)  # let the window draw the figure before saving it
+    background = fig.canvas.copy_from_bbox(fig.bbox)
+    fig.draw_artist(image_artist)
+    fig.canvas.blit(fig.bbox)
+
+    # Randomly take 10 actions, sampled all at once, and show observation
+    for action in np.random.randint(NUM_ACTIONS, size=10):
+        rets = env.step(action)
         image = rets[0]
-        plt.imshow(image)
-        plt.draw()
-        plt.pause(0.5)
+
+        # Only redraw the image over the saved background of the figure.
+        image_artist.set_data(image)
+        fig.canvas.restore_region(background)
+        fig.draw_artist(image_artist)
+        fig.canvas.blit(fig.bbox)
+        fig.canvas.flush_events()
+        fig.canvas.start_event_loop(0.5)  # wait without redrawing the figure
 
 
 if __name__ == '__main__':
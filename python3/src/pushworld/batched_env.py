@@ -0,0 +1,298 @@
+# Copyright 2022 DeepMind Technologies Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import functools
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from pushworld.config import PUZZLE_EXTENSION
+from pushworld.puzzle import (
+    AGENT_IDX,
+    NUM_ACTIONS,
+    Actions,
+    BraindeadPushWorldPuzzle,
+    PushWorldPuzzle,
+    State,
+)
+from pushworld.utils.env_utils import load_puzzle_dimensions
+from pushworld.utils.filesystem import iter_files_with_extension
+
+
+class BatchedPushWorldEnv:
+    """Steps a batch of PushWorld environments together.
+
+    Rewards and observations match those of `pushworld.gym_env.PushWorldEnv`, but all
+    environments are stepped with a single call and their observations are written
+    into one preallocated array, which avoids the per-environment overhead of
+    running many `PushWorldEnv` instances side by side.
+
+    Braindead puzzles only contain an agent and a goal, so their states are stored as
+    arrays and every environment is stepped at once with NumPy operations. States of
+    standard puzzles are stepped one environment at a time with
+    `PushWorldPuzzle.get_next_state`.
+
+    Environments are reset automatically when they terminate or are truncated. In
+    that case, `step` returns the first observation of the next puzzle.
+
+    Args:
+        puzzle_path: The path of a PushWorld puzzle file or of a directory that
+            contains puzzle files, possibly nested in subdirectories. Each environment
+            randomly selects a new puzzle from all discovered puzzles when it is
+            reset.
+        num_envs: The number of environments in the batch.
+        braindead: If True, puzzles are loaded as `BraindeadPushWorldPuzzle`s.
+        seed: The seed of the random number generator that selects puzzles.
+        max_steps: If not None, an environment is truncated after `max_steps` steps
+            since it was most recently reset.
+        max_cached_puzzles: The maximum number of loaded puzzles to keep in memory.
+            If None, every puzzle stays in memory once it has been loaded.
+        dimensions_manifest_path: If not None, the path of a JSON file that caches
+            the dimensions of the puzzles in `puzzle_path`, so that they are not
+            read again when another environment is created. See
+            `pushworld.utils.env_utils.load_puzzle_dimensions`.
+    """
+
+    def __init__(
+        self,
+        puzzle_path: str,
+        num_envs: int,
+        braindead: bool = False,
+        seed: Optional[int] = 123,
+        max_steps: Optional[int] = None,
+        max_cached_puzzles: Optional[int] = 128,
+        dimensions_manifest_path: Optional[str] = None,
+    ) -> None:
+        if num_envs < 1:
+            raise ValueError("num_envs must be >= 1")
+
+        self._puzzle_paths = list(
+            iter_files_with_extension(puzzle_path, PUZZLE_EXTENSION)
+        )
+        if len(self._puzzle_paths) == 0:
+            raise ValueError(f"No PushWorld puzzles found in: {puzzle_path}")
+
+        self._num_envs = num_envs
+        self._braindead = braindead
+        self._max_steps = max_steps
+        self._random_generator = np.random.default_rng(seed)
+        self._load_puzzle = functools.lru_cache(maxsize=max_cached_puzzles)(
+            BraindeadPushWorldPuzzle if braindead else PushWorldPuzzle
+        )
+
+        # Observations of all puzzles are padded to the same shape so that they can
+        # be stacked. Unlike braindead puzzles, `PushWorldPuzzle` adds walls around
+        # the grid.
+        wall_padding = 0 if braindead else 2
+        widths, heights = zip(
+            *load_puzzle_dimensions(
+                puzzle_path, self._puzzle_paths, dimensions_manifest_path
+            ).values()
+        )
+        num_channels = 2 if braindead else 4
+        self._observations = np.zeros(
+            (
+                num_envs,
+                max(heights) + wall_padding,
+                max(widths) + wall_padding,
+                num_channels,
+            ),
+            dtype=np.float32,
+        )
+
+        self._puzzles: List[Optional[PushWorldPuzzle]] = [None] * num_envs
+        self._states: List[Optional[State]] = [None] * num_envs
+        self._steps = np.zeros(num_envs, dtype=np.int64)
+        self._achieved_goals = np.zeros(num_envs, dtype=np.int64)
+
+        # Braindead states, stored as (x, y) positions of every environment.
+        self._agent_positions = np.zeros((num_envs, 2), dtype=np.int64)
+        self._goal_positions = np.zeros((num_envs, 2), dtype=np.int64)
+        self._dimensions = np.zeros((num_envs, 2), dtype=np.int64)
+
+        self._env_indices = np.arange(num_envs)
+
+    @property
+    def num_envs(self) -> int:
+        """The number of environments in the batch."""
+        return self._num_envs
+
+    @property
+    def observation_shape(self) -> Tuple[int, ...]:
+        """The (height, width, channels) shape of the observation of one
+        environment."""
+        return self._observations.shape[1:]
+
+    @property
+    def puzzles(self) -> List[Optional[PushWorldPuzzle]]:
+        """The current puzzle of each environment, or `None` before `reset`."""
+        return self._puzzles
+
+    @property
+    def states(self) -> List[Optional[State]]:
+        """The current state of each environment, or `None` before `reset`."""
+        if self._braindead and self._puzzles[0] is not None:
+            # Braindead states only contain the agent position.
+            return [(tuple(position),) for position in self._agent_positions.tolist()]
+        return self._states
+
+    def reset(self, seed: Optional[int] = None) -> np.ndarray:
+        """Resets every environment to the initial state of a randomly selected
+        puzzle.
+
+        Args:
+            seed: If not None, the random number generator that selects puzzles is
+                reset with this seed.
+
+        Returns:
+            The observations of all environments, formatted as a `float32` array with
+            shape (num_envs, height, width, channels). The array is overwritten by the
+            next call to `reset` or `step`.
+        """
+        if seed is not None:
+            self._random_generator = np.random.default_rng(seed)
+
+        self._reset_envs(self._env_indices)
+        return self._observations
+
+    def step(
+        self, actions: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Performs one action in every environment.
+
+        Args:
+            actions: An integer array with shape (num_envs,) that contains the action
+                to perform in each environment.
+
+        Returns:
+            A tuple of (observations, rewards, terminated, truncated). The observations
+            are formatted as in `reset`. The other arrays have shape (num_envs,).
+        """
+        actions = np.asarray(actions)
+        if actions.shape != (self._num_envs,) or not np.issubdtype(
+            actions.dtype, np.integer
+        ):
+            raise ValueError(
+                f"actions must be an integer array with shape ({self._num_envs},)"
+            )
+        if ((actions < 0) | (actions >= NUM_ACTIONS)).any():
+            raise ValueError("The provided actions are not in the action space.")
+        if self._puzzles[0] is None:
+            raise RuntimeError("reset() must be called before step() can be called.")
+
+        self._steps += 1
+
+        if self._braindead:
+            achieved_goals, terminated = self._step_braindead(actions)
+        else:
+            achieved_goals, terminated = self._step_standard(actions)
+
+        rewards = np.where(
+            terminated, 10.0, achieved_goals - self._achieved_goals - 0.01
+        )
+        self._achieved_goals = achieved_goals
+
+        if self._max_steps is None:
+            truncated = np.zeros(self._num_envs, dtype=bool)
+        else:
+            truncated = self._steps >= self._max_steps
+
+        done = np.flatnonzero(terminated | truncated)
+        if len(done) > 0:
+            self._reset_envs(done)
+
+        return self._observations, rewards, terminated, truncated
+
+    def _step_braindead(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Moves the agents of all braindead puzzles and renders the new
+        observations.
+
+        Returns:
+            A tuple of (achieved_goals, terminated) arrays with shape (num_envs,).
+        """
+        positions = self._agent_positions
+        next_positions = positions + Actions.DISPLACEMENTS[actions]
+        in_bounds = ((next_positions >= 1) & (next_positions <= self._dimensions)).all(
+            axis=1
+        )
+        positions[in_bounds] = next_positions[in_bounds]
+
+        self._render_braindead(self._env_indices)
+        terminated = (positions == self._goal_positions).all(axis=1)
+        return terminated.astype(np.int64), terminated
+
+    def _step_standard(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Steps every standard puzzle and renders the new observations.
+
+        Returns:
+            A tuple of (achieved_goals, terminated) arrays with shape (num_envs,).
+        """
+        achieved_goals = np.empty(self._num_envs, dtype=np.int64)
+        terminated = np.empty(self._num_envs, dtype=bool)
+
+        for i, (puzzle, action) in enumerate(zip(self._puzzles, actions.tolist())):
+            state = self._states[i] = puzzle.get_next_state(self._states[i], action)
+            achieved_goals[i] = puzzle.count_achieved_goals(state)
+            terminated[i] = puzzle.is_goal_state(state)
+            self._render_standard(i)
+
+        return achieved_goals, terminated
+
+    def _reset_envs(self, env_indices: np.ndarray) -> None:
+        """Selects a new puzzle for each of the given environments and resets them to
+        the initial state of that puzzle."""
+        puzzle_indices = self._random_generator.integers(
+            len(self._puzzle_paths), size=len(env_indices)
+        )
+
+        for i, puzzle_idx in zip(env_indices.tolist(), puzzle_indices.tolist()):
+            puzzle = self._load_puzzle(self._puzzle_paths[puzzle_idx])
+            self._puzzles[i] = puzzle
+            self._achieved_goals[i] = puzzle.count_achieved_goals(puzzle.initial_state)
+
+            if self._braindead:
+                self._agent_positions[i] = puzzle.initial_state[AGENT_IDX]
+                self._goal_positions[i] = puzzle.goal_state[0]
+                self._dimensions[i] = puzzle.dimensions
+            else:
+                self._states[i] = puzzle.initial_state
+                # Clear the padding that a larger previous puzzle may have drawn into.
+                self._observations[i].fill(0)
+                self._render_standard(i)
+
+        self._steps[env_indices] = 0
+
+        if self._braindead:
+            self._render_braindead(env_indices)
+
+    def _render_braindead(self, env_indices: np.ndarray) -> None:
+        """Renders the observations of the given braindead environments in the same
+        format as `BraindeadPushWorldPuzzle.render`."""
+        observations = self._observations
+        observations[env_indices] = 0
+
+        agent_x, agent_y = self._agent_positions[env_indices].T
+        observations[env_indices, agent_y - 1, agent_x - 1, 0] = 1
+
+        goal_x, goal_y = self._goal_positions[env_indices].T
+        observations[env_indices, goal_y - 1, goal_x - 1, 1] = 1
+
+    def _render_standard(self, env_idx: int) -> None:
+        """Renders the observation of the given standard environment in the same
+        format as `PushWorldPuzzle.render_simple`."""
+        width, height = self._puzzles[env_idx].dimensions
+        self._puzzles[env_idx].render_simple(
+            self._states[env_idx],
+            out=self._observations[env_idx, :height, :width],
+        )
@@ -4,12 +4,41 @@ Script to distribute puzzles from original folder to train, test, and archive fo
 """
 
 import argparse
+import contextlib
+import errno
+import itertools
+import math
 import os
 import random
 import shutil
-from pathlib import Path
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
 
+# Size of the userspace buffer used when no in-kernel copy is available.
+_COPY_BUFFER_SIZE = 1024 * 1024
+
+# Errors that indicate an in-kernel copy is not supported for a pair of files, in
+# which case the next (slower) copy method is tried.
+_UNSUPPORTED_COPY_ERRNOS = {
+    errno.EINVAL,
+    errno.ENOSYS,
+    errno.EXDEV,
+    errno.EBADF,
+    errno.ENOTSUP,
+    errno.EOPNOTSUPP,
+    errno.ENOTSOCK,
+}
+
+
+def _default_max_workers() -> int:
+    """Returns the default number of threads used to copy and remove puzzle files.
+
+    File operations are I/O bound, so more threads than CPU cores are used to keep
+    the storage queue busy.
+    """
+    return min(32, (os.cpu_count() or 1) * 4)
+
 
 def list_puzzle_files(directory: str) -> List[str]:
     """Get all puzzle files (.pwp) from a directory.
@@ -20,11 +49,220 @@ def list_puzzle_files(directory: str) -> List[str]:
     Returns:
         List of puzzle filenames
     """
-    puzzle_dir = Path(directory)
-    if not puzzle_dir.exists():
+    return [entry.name for entry in _scan_puzzle_files(directory)]
+
+
+def _scan_puzzle_files(directory: str) -> List[os.DirEntry]:
+    """Get the directory entries of all puzzle files (.pwp) in a directory.
+
+    Each `os.DirEntry` caches its file type and `stat` result, so no extra system
+    calls are needed to check or copy the files later. Unlike `Path.glob`, this does
+    not `stat` every entry in the directory.
+
+    Args:
+        directory: Path to the directory containing puzzle files
+
+    Returns:
+        List of directory entries, in the order returned by the file system
+    """
+    try:
+        with os.scandir(directory) as entries:
+            return [
+                entry
+                for entry in entries
+                if entry.name.endswith(".pwp") and entry.is_file()
+            ]
+    except FileNotFoundError:
         return []
 
-    return [f.name for f in puzzle_dir.glob("*.pwp")]
+
+def _scan_stale_puzzle_files(directory: str) -> List[os.DirEntry]:
+    """Get the directory entries of all puzzle files (.pwp) to remove from a split.
+
+    Unlike `_scan_puzzle_files`, symbolic links are not followed. The file type
+    reported by `os.scandir` is enough to select the entries without any `stat`
+    calls, and dangling links to puzzles are removed as well.
+
+    Args:
+        directory: Path to the directory containing puzzle files
+
+    Returns:
+        List of directory entries, in the order returned by the file system
+    """
+    try:
+        with os.scandir(directory) as entries:
+            return [
+                entry
+                for entry in entries
+                if entry.name.endswith(".pwp")
+                and not entry.is_dir(follow_symlinks=False)
+            ]
+    except FileNotFoundError:
+        return []
+
+
+def _kernel_copy(src_fd: int, dst_fd: int, size: int) -> bool:
+    """Copies `size` bytes between two open files without a userspace buffer.
+
+    `os.copy_file_range` is tried first, since it can share extents (reflink) on
+    file systems such as btrfs and XFS. If it is unavailable, `os.sendfile` is used
+    on Linux. Other platforms (e.g. macOS) only support `sendfile` to a socket.
+
+    Returns:
+        True if the file was copied, or False if neither method is supported for
+        these files.
+    """
+    copy_functions = []
+    if hasattr(os, "copy_file_range"):
+        copy_functions.append(
+            lambda offset: os.copy_file_range(
+                src_fd, dst_fd, size - offset, offset, offset
+            )
+        )
+    if hasattr(os, "sendfile") and sys.platform.startswith("linux"):
+        copy_functions.append(
+            lambda offset: os.sendfile(dst_fd, src_fd, offset, size - offset)
+        )
+
+    for copy_function in copy_functions:
+        # Every attempt restarts from the beginning of both files.
+        os.lseek(dst_fd, 0, os.SEEK_SET)
+        offset = 0
+        try:
+            while offset < size:
+                copied = copy_function(offset)
+                if copied == 0:
+                    break  # the source file was truncated during the copy
+                offset += copied
+        except OSError as error:
+            if error.errno not in _UNSUPPORTED_COPY_ERRNOS:
+                raise
+            continue
+        os.ftruncate(dst_fd, offset)
+        return True
+
+    return False
+
+
+def _open_directory(path: str, exit_stack: contextlib.ExitStack) -> Optional[int]:
+    """Opens a directory so that files in it can be opened relative to it.
+
+    Args:
+        path: Path of the directory
+        exit_stack: Closes the directory when it exits
+
+    Returns:
+        The file descriptor of the directory, or None if the platform does not
+        support opening, linking, and updating files relative to a directory (e.g.
+        Windows)
+    """
+    if not {os.open, os.link, os.utime} <= os.supports_dir_fd:
+        return None
+
+    dir_fd = os.open(path, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+    exit_stack.callback(os.close, dir_fd)
+    return dir_fd
+
+
+def _copy_file_relative(
+    src_name: str, dst_name: str, size: int, src_dir_fd: int, dst_dir_fd: int
+) -> None:
+    """Copies a file between two open directories on POSIX platforms.
+
+    Args:
+        src_name: Name of the file to copy in the `src_dir_fd` directory
+        dst_name: Name of the copy in the `dst_dir_fd` directory, which is
+            overwritten if it exists
+        size: Size of the source file in bytes
+        src_dir_fd: An open file descriptor of the source directory
+        dst_dir_fd: An open file descriptor of the destination directory
+    """
+    src_fd = os.open(src_name, os.O_RDONLY, dir_fd=src_dir_fd)
+    try:
+        dst_fd = os.open(
+            dst_name,
+            os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+            0o666,
+            dir_fd=dst_dir_fd,
+        )
+        try:
+            if not _kernel_copy(src_fd, dst_fd, size):
+                os.lseek(dst_fd, 0, os.SEEK_SET)
+                buffer = memoryview(bytearray(_COPY_BUFFER_SIZE))
+                while True:
+                    num_bytes = os.readv(src_fd, [buffer])
+                    if num_bytes == 0:
+                        break
+                    # `os.write` may write fewer bytes than requested.
+                    chunk = buffer[:num_bytes]
+                    while chunk:
+                        chunk = chunk[os.write(dst_fd, chunk) :]
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+
+
+def _copy_puzzle_file(
+    entry: os.DirEntry,
+    dst_dir: str,
+    preserve_timestamps: bool = False,
+    src_dir_fd: Optional[int] = None,
+    dst_dir_fd: Optional[int] = None,
+    hardlink: bool = False,
+) -> None:
+    """Copies a puzzle file, using in-kernel copies where the platform supports them.
+
+    Unlike `shutil.copy2`, permissions and extended attributes are not copied. The
+    fast path that opens files relative to `src_dir_fd` and `dst_dir_fd` is only
+    used when both are given. Otherwise, the file is copied with
+    `shutil.copyfileobj`, which works on every platform.
+
+    Args:
+        entry: The directory entry of the file to copy
+        dst_dir: Directory of the copy, which has the same name as the source file
+            and is overwritten if it exists
+        preserve_timestamps: If True, the access and modification times of the
+            source file are applied to the destination file
+        src_dir_fd: If not None, an open file descriptor of the directory that
+            contains `entry`, as returned by `_open_directory`. Opening files
+            relative to an open directory (as with `openat`) avoids resolving the
+            full path of every file.
+        dst_dir_fd: If not None, an open file descriptor of `dst_dir`
+        hardlink: If True, the destination is created as a hard link to the source
+            file when both are on the same file system, so no data is copied. The
+            file is copied if the link cannot be created.
+    """
+    use_dir_fds = src_dir_fd is not None and dst_dir_fd is not None
+    if use_dir_fds:
+        src_path = dst_path = entry.name
+    else:
+        src_path = entry.path
+        dst_path = dst_dir + os.sep + entry.name
+        src_dir_fd = dst_dir_fd = None
+
+    if hardlink:
+        try:
+            os.link(src_path, dst_path, src_dir_fd=src_dir_fd, dst_dir_fd=dst_dir_fd)
+            return  # a hard link shares the timestamps of the source file
+        except OSError:
+            pass  # e.g. different file systems or no hard link support
+
+    src_stat = entry.stat()
+    if use_dir_fds:
+        _copy_file_relative(
+            src_path, dst_path, src_stat.st_size, src_dir_fd, dst_dir_fd
+        )
+    else:
+        with open(src_path, "rb") as src_file, open(dst_path, "wb") as dst_file:
+            shutil.copyfileobj(src_file, dst_file, _COPY_BUFFER_SIZE)
+
+    if preserve_timestamps:
+        os.utime(
+            dst_path,
+            ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns),
+            dir_fd=dst_dir_fd,
+        )
 
 
 def shuffle_puzzles(
@@ -33,6 +271,9 @@ def shuffle_puzzles(
     test_percent: float = 0.2,
     archive_percent: float = 0.1,
     seed: Optional[int] = None,
+    preserve_timestamps: bool = False,
+    max_workers: Optional[int] = None,
+    hardlink: bool = False,
 ) -> Dict[str, int]:
     """Distribute puzzles from original folder to train, test, and archive folders.
 
@@ -42,6 +283,15 @@ def shuffle_puzzles(
         test_percent: Percentage of puzzles to put in test folder
         archive_percent: Percentage of puzzles to put in archive folder
         seed: Random seed for reproducibility
+        preserve_timestamps: If True, copied puzzles keep the access and
+            modification times of the originals
+        max_workers: Number of threads used to copy and remove files. Defaults to
+            four threads per CPU core, up to 32. Consider a larger value when the
+            puzzles are stored on a network file system.
+        hardlink: If True, puzzles are hard linked into the splits instead of
+            copied when the splits are on the same file system as the originals.
+            Linked puzzles share their contents with the originals, so editing a
+            puzzle in one place changes it in the other.
 
     Returns:
         Dictionary with counts of puzzles in each folder
@@ -49,9 +299,10 @@ def shuffle_puzzles(
     if seed is not None:
         random.seed(seed)
 
-    # Normalize percentages
+    # Normalize percentages. Sums such as 0.7 + 0.2 + 0.1 are not exactly 1.0 in
+    # floating point, so they are compared with a tolerance.
     total = train_percent + test_percent + archive_percent
-    if round(total, 10) != 1.0:
+    if not math.isclose(total, 1.0, rel_tol=1e-9):
         print(f"Warning: Percentages sum to {total}, normalizing to 100%")
         train_percent = train_percent / total
         test_percent = test_percent / total
@@ -67,48 +318,61 @@ def shuffle_puzzles(
     for directory in [original_dir, train_dir, test_dir, archive_dir]:
         os.makedirs(directory, exist_ok=True)
 
-    # Clear the target directories first
-    for directory in [train_dir, test_dir, archive_dir]:
-        for file in os.listdir(directory):
-            file_path = os.path.join(directory, file)
-            if os.path.isfile(file_path) and file.endswith(".pwp"):
-                os.remove(file_path)
-
-    # Get all puzzle files from original directory
-    puzzle_files = list_puzzle_files(original_dir)
-
-    if not puzzle_files:
-        print("No puzzle files found in original directory")
-        return {"train": 0, "test": 0, "archive": 0}
-
-    # Shuffle files
-    random.shuffle(puzzle_files)
-
-    # Calculate split points
-    total_files = len(puzzle_files)
-    train_count = int(total_files * train_percent)
-    test_count = int(total_files * test_percent)
-
-    # Split the files
-    train_subset = puzzle_files[:train_count]
-    test_subset = puzzle_files[train_count : train_count + test_count]
-    archive_subset = puzzle_files[train_count + test_count :]
-
-    # Copy files to their destination folders
-    for filename in train_subset:
-        shutil.copy2(
-            os.path.join(original_dir, filename), os.path.join(train_dir, filename)
-        )
+    if max_workers is None:
+        max_workers = _default_max_workers()
 
-    for filename in test_subset:
-        shutil.copy2(
-            os.path.join(original_dir, filename), os.path.join(test_dir, filename)
+    with contextlib.ExitStack() as exit_stack:
+        executor = exit_stack.enter_context(ThreadPoolExecutor(max_workers=max_workers))
+        # Clear the target directories first. This must finish before any copies
+        # start, since a copy may reuse the name of a stale puzzle.
+        stale_files = itertools.chain.from_iterable(
+            _scan_stale_puzzle_files(directory)
+            for directory in [train_dir, test_dir, archive_dir]
         )
+        list(executor.map(lambda entry: os.unlink(entry.path), stale_files))
 
-    for filename in archive_subset:
-        shutil.copy2(
-            os.path.join(original_dir, filename), os.path.join(archive_dir, filename)
-        )
+        # Get all puzzle files from original directory
+        puzzle_files = _scan_puzzle_files(original_dir)
+
+        if not puzzle_files:
+            print("No puzzle files found in original directory")
+            return {"train": 0, "test": 0, "archive": 0}
+
+        # Shuffle files
+        random.shuffle(puzzle_files)
+
+        # Calculate split points
+        total_files = len(puzzle_files)
+        train_count = int(total_files * train_percent)
+        test_count = int(total_files * test_percent)
+
+        # Split the files
+        train_subset = puzzle_files[:train_count]
+        test_subset = puzzle_files[train_count : train_count + test_count]
+        archive_subset = puzzle_files[train_count + test_count :]
+
+        # Copy files to their destination folders. Every directory is opened once,
+        # and the files are opened relative to it.
+        src_dir_fd = _open_directory(original_dir, exit_stack)
+        copies = []
+        for subset, directory in [
+            (train_subset, train_dir),
+            (test_subset, test_dir),
+            (archive_subset, archive_dir),
+        ]:
+            dst_dir_fd = _open_directory(directory, exit_stack)
+            copies.extend(
+                (
+                    entry,
+                    directory,
+                    preserve_timestamps,
+                    src_dir_fd,
+                    dst_dir_fd,
+                    hardlink,
+                )
+                for entry in subset
+            )
+        list(executor.map(lambda copy: _copy_puzzle_file(*copy), copies))
 
     result = {
         "train": len(train_subset),
@@ -151,6 +415,17 @@ def main():
         help="Percentage for archive (default: 10.0)",
     )
     parser.add_argument("--seed", type=int, help="Random seed for reproducibility")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of threads used to copy files (default: min(32, 4 * CPU count))",
+    )
+    parser.add_argument(
+        "--hardlink",
+        action="store_true",
+        help="Hard link puzzles into the splits instead of copying them when possible",
+    )
 
     args = parser.parse_args()
 
@@ -160,6 +435,8 @@ def main():
         test_percent=args.test,
         archive_percent=args.archive,
         seed=args.seed,
+        max_workers=args.workers,
+        hardlink=args.hardlink,
     )
 
 
@@ -12,7 +12,6 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import random
 from typing import Optional
 
 
@@ -109,7 +108,7 @@ class PushWorldEnv(dm_env.Environment):
 
         # Use a fixed arbitrary seed for reproducibility of results and for
         # deterministic tests.
-        self._random_generator = random.Random(123)
+        self._random_generator = np.random.default_rng(123)
 
         self._current_puzzle = None
         self._current_state = None
@@ -167,9 +166,10 @@ class PushWorldEnv(dm_env.Environment):
             values ranging from [0, 1]. The info dictionary is unused.
         """
         if seed is not None:
-          self._random_generator = random.Random(seed)
+          self._random_generator = np.random.default_rng(seed)
 
-        self._current_puzzle = self._random_generator.choice(self._puzzles)
+        puzzle_idx = self._random_generator.integers(len(self._puzzles))
+        self._current_puzzle = self._puzzles[puzzle_idx]
         self._current_state = self._current_puzzle.initial_state
         self._current_achieved_goals = self._current_puzzle.count_achieved_goals(
             self._current_state
@@ -202,7 +202,6 @@ class PushWorldEnv(dm_env.Environment):
           raise RuntimeError("reset() must be called before step() can be called.")
 
         self._steps += 1
-        previous_state = self._current_state
         self._current_state = self._current_puzzle.get_next_state(
             self._current_state, action
         )
@@ -211,17 +210,16 @@ class PushWorldEnv(dm_env.Environment):
         )
 
         terminated = self._current_puzzle.is_goal_state(self._current_state)
+        current_achieved_goals = self._current_puzzle.count_achieved_goals(
+            self._current_state
+        )
 
         if terminated:
           reward = 10.0
         else:
-          previous_achieved_goals = self._current_puzzle.count_achieved_goals(
-              previous_state
-          )
-          current_achieved_goals = self._current_puzzle.count_achieved_goals(
-              self._current_state
-          )
-          reward = current_achieved_goals - previous_achieved_goals - 0.01
+          reward = current_achieved_goals - self._current_achieved_goals - 0.01
+
+        self._current_achieved_goals = current_achieved_goals
 
         truncated = (
             False if self._max_steps is None else self._steps >= self._max_steps
@@ -241,12 +239,14 @@ class PushWorldEnv(dm_env.Environment):
             `np.float32` array with shape (height, width, 3).
         """
         assert mode == "rgb_array", "mode must be rgb_array."
-        return (
+        # Convert and scale the `uint8` image in one pass.
+        return np.divide(
             self._current_puzzle.render(
                 self._current_state,
                 border_width=self._border_width,
                 pixels_per_cell=self._pixels_per_cell,
-            ).astype(np.float32)
-            / 255
+            ),
+            255,
+            dtype=np.float32,
         )
 
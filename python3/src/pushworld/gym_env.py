@@ -12,7 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import random
+import functools
 from typing import Optional, Tuple, Union
 
 import gymnasium as gym
@@ -29,9 +29,13 @@ from pushworld.puzzle import (
 )
 from pushworld.utils.env_utils import (
     get_max_puzzle_dimensions,
+    load_puzzle_dimensions,
 )
 from pushworld.utils.filesystem import iter_files_with_extension
 
+# The number of puzzle indices that are drawn at once for future calls of `reset`.
+_PUZZLE_INDEX_BLOCK_SIZE = 1024
+
 
 class PushWorldEnv(gym.Env):
     """
@@ -44,9 +48,9 @@ class PushWorldEnv(gym.Env):
 
     Args:
         puzzle_path: The path of a PushWorld puzzle file or of a directory that
-            contains puzzle files, possibly nested in subdirectories. All discovered
-            puzzles are loaded, and the `reset` method randomly selects a new puzzle
-            each time it is called.
+            contains puzzle files, possibly nested in subdirectories. The `reset`
+            method randomly selects a new puzzle from all discovered puzzles each
+            time it is called. Puzzles are only loaded when they are selected.
         max_steps: If not None, the `step` method will return `done = True` after
             calling it `max_steps` times since the most recent call of `reset`.
         border_width: The pixel width of the border drawn to indicate object boundaries.
@@ -59,6 +63,20 @@ class PushWorldEnv(gym.Env):
             all puzzles found in the `puzzle_path`.
         render_mode: The mode to use when rendering. Gymnasium expects this to be set on the
             environment. (Currently only "rgb_array" is supported.)
+        max_cached_puzzles: The maximum number of loaded puzzles to keep in memory.
+            If None, every puzzle stays in memory once it has been loaded.
+        copy_obs: If True, `reset` and `step` return a newly allocated observation
+            array. If False, every observation is rendered into the same
+            preallocated array, which is overwritten by the next call to `reset` or
+            `step`. Callers that keep observations (e.g. in a replay buffer) must
+            copy them in that case.
+        return_obs: If False, `reset` and `step` skip rendering observations and
+            return None in their place. This is useful when only rewards and
+            terminations are needed, e.g. when evaluating a fixed plan.
+        dimensions_manifest_path: If not None, the path of a JSON file that caches
+            the dimensions of the puzzles in `puzzle_path`, so that they are not
+            read again when another environment is created. See
+            `pushworld.utils.env_utils.load_puzzle_dimensions`.
     """
 
     # For Gymnasium, metadata is usually defined as a class attribute.
@@ -74,6 +92,10 @@ class PushWorldEnv(gym.Env):
         pixels_per_cell: int = DEFAULT_PIXELS_PER_CELL,
         standard_padding: bool = False,
         render_mode: Optional[str] = None,
+        max_cached_puzzles: Optional[int] = 128,
+        copy_obs: bool = True,
+        return_obs: bool = True,
+        dimensions_manifest_path: Optional[str] = None,
     ) -> None:
         # Call the parent constructor (Gymnasium recommends this)
         super().__init__()
@@ -91,20 +113,24 @@ class PushWorldEnv(gym.Env):
             pygame.display.init()
             self.clock = pygame.time.Clock()
 
-        self._puzzles = []
-        for puzzle_file_path in iter_files_with_extension(
-            puzzle_path, PUZZLE_EXTENSION
-        ):
-            self._puzzles.append(
-                BraindeadPushWorldPuzzle(puzzle_file_path)
-                if self.braindead
-                else PushWorldPuzzle(puzzle_file_path)
-            )
+        self._puzzle_paths = list(
+            iter_files_with_extension(puzzle_path, PUZZLE_EXTENSION)
+        )
+        self._load_puzzle = functools.lru_cache(maxsize=max_cached_puzzles)(
+            BraindeadPushWorldPuzzle if self.braindead else PushWorldPuzzle
+        )
+        # The observation renderer of the puzzle class, called with the puzzle as
+        # its first argument.
+        self._render_obs = (
+            BraindeadPushWorldPuzzle.render
+            if self.braindead
+            else PushWorldPuzzle.render_simple
+        )
 
         # Use a set, every time solved, we add to set, also O(1) to get length
         self._solved_puzzles = set()
 
-        if len(self._puzzles) == 0:
+        if len(self._puzzle_paths) == 0:
             raise ValueError(f"No PushWorld puzzles found in: {puzzle_path}")
         if border_width < 1:
             raise ValueError("border_width must be >= 1")
@@ -115,9 +141,17 @@ class PushWorldEnv(gym.Env):
         self._pixels_per_cell = pixels_per_cell
         self._border_width = border_width
 
-        widths, heights = zip(*[puzzle.dimensions for puzzle in self._puzzles])
-        self._max_cell_width = max(widths)
-        self._max_cell_height = max(heights)
+        # Read the dimensions from the puzzle files (or their cached manifest)
+        # instead of loading every puzzle. Unlike braindead puzzles,
+        # `PushWorldPuzzle` adds walls around the grid.
+        wall_padding = 0 if self.braindead else 2
+        widths, heights = zip(
+            *load_puzzle_dimensions(
+                puzzle_path, self._puzzle_paths, dimensions_manifest_path
+            ).values()
+        )
+        self._max_cell_width = max(widths) + wall_padding
+        self._max_cell_height = max(heights) + wall_padding
 
         if standard_padding:
             standard_cell_height, standard_cell_width = get_max_puzzle_dimensions()
@@ -140,20 +174,22 @@ class PushWorldEnv(gym.Env):
 
         # Use a fixed arbitrary seed for reproducibility of results and for
         # deterministic tests.
-        self._random_generator = random.Random(seed)
+        self._random_generator = np.random.default_rng(seed)
+        self._puzzle_indices = []
+        self._puzzle_index_cursor = 0
 
         self._current_puzzle = None
         self._current_state = None
 
         # Define the action space and observation space as attributes.
         self._action_space = gym.spaces.Discrete(NUM_ACTIONS)
+        self._n_actions = NUM_ACTIONS
+        example_puzzle = self._load_puzzle(self._puzzle_paths[0])
         example_obs = (
-            self._puzzles[0].render(self._puzzles[0].initial_state)
-            if self.braindead
-            else self._puzzles[0].render_simple(self._puzzles[0].initial_state)
-            # else render_observation_padded(
-            #     self._puzzles[0],
-            #     self._puzzles[0].initial_state,
+            self._render_obs(example_puzzle, example_puzzle.initial_state)
+            # render_observation_padded(
+            #     example_puzzle,
+            #     example_puzzle.initial_state,
             #     self._max_cell_height,
             #     self._max_cell_width,
             #     self._pixels_per_cell,
@@ -167,6 +203,10 @@ class PushWorldEnv(gym.Env):
             dtype=np.float32,
         )
 
+        self._copy_obs = copy_obs
+        self._return_obs = return_obs
+        self._obs_buf = np.empty(example_obs.shape, dtype=example_obs.dtype)
+
     @property
     def action_space(self) -> gym.spaces.Space:
         """Implements `gym.Env.action_space`."""
@@ -185,7 +225,7 @@ class PushWorldEnv(gym.Env):
     @property
     def solved_percentage(self) -> float:
         """The percentage of puzzles that have been solved."""
-        return len(self._solved_puzzles) / len(self._puzzles)
+        return len(self._solved_puzzles) / len(self._puzzle_paths)
 
     def reset(
         self,
@@ -210,9 +250,12 @@ class PushWorldEnv(gym.Env):
         """
         if options is None or options["maintain_puzzle"] is False:
             if seed is not None:
-                self._random_generator = random.Random(seed)
+                self._random_generator = np.random.default_rng(seed)
+                self._puzzle_indices = []
+                self._puzzle_index_cursor = 0
 
-            self._current_puzzle = self._random_generator.choice(self._puzzles)
+            puzzle_idx = self._next_puzzle_index()
+            self._current_puzzle = self._load_puzzle(self._puzzle_paths[puzzle_idx])
         else:
             # If we do want to maintain puzzle,
             pass
@@ -231,10 +274,7 @@ class PushWorldEnv(gym.Env):
         #     self._border_width,
         # )
 
-        if self.braindead:
-            observation = self._current_puzzle.render(self._current_state)
-        else:
-            observation = self._current_puzzle.render_simple(self._current_state)
+        observation = self._render_observation()
         info = {"puzzle_state": self._current_state}
 
         return observation, info
@@ -250,7 +290,16 @@ class PushWorldEnv(gym.Env):
         formatted as a `float32` array with shape (height, width, 3) and values ranging
         from [0, 1].
         """
-        if not self._action_space.contains(action):
+        # Like `self._action_space.contains(action)`, this accepts Python ints and
+        # NumPy integer scalars or 0-d arrays (as returned by many agents for a
+        # single environment), without the overhead of `gym.spaces.Discrete`.
+        if (
+            isinstance(action, (np.ndarray, np.integer))
+            and action.ndim == 0
+            and np.issubdtype(action.dtype, np.integer)
+        ):
+            action = int(action)
+        if not (isinstance(action, int) and 0 <= action < self._n_actions):
             raise ValueError(
                 "The provided action is not in the action space. Provided action: "
                 + str(action)
@@ -260,7 +309,6 @@ class PushWorldEnv(gym.Env):
             raise RuntimeError("reset() must be called before step() can be called.")
 
         self._steps += 1
-        previous_state = self._current_state
         self._current_state = self._current_puzzle.get_next_state(
             self._current_state, action
         )
@@ -272,24 +320,20 @@ class PushWorldEnv(gym.Env):
         #     self._pixels_per_cell,
         #     self._border_width,
         # )
-        if self.braindead:
-            observation = self._current_puzzle.render(self._current_state)
-        else:
-            observation = self._current_puzzle.render_simple(self._current_state)
+        observation = self._render_observation()
 
         terminated = self._current_puzzle.is_goal_state(self._current_state)
+        current_achieved_goals = self._current_puzzle.count_achieved_goals(
+            self._current_state
+        )
 
         if terminated:
             reward = 10.0
             self._solved_puzzles.add(self._current_puzzle.name)
         else:
-            previous_achieved_goals = self._current_puzzle.count_achieved_goals(
-                previous_state
-            )
-            current_achieved_goals = self._current_puzzle.count_achieved_goals(
-                self._current_state
-            )
-            reward = current_achieved_goals - previous_achieved_goals - 0.01
+            reward = current_achieved_goals - self._current_achieved_goals - 0.01
+
+        self._current_achieved_goals = current_achieved_goals
 
         truncated = False if self._max_steps is None else self._steps >= self._max_steps
         info = {"puzzle_state": self._current_state}
@@ -299,6 +343,47 @@ class PushWorldEnv(gym.Env):
 
         return observation, reward, terminated, truncated, info
 
+    def _next_puzzle_index(self) -> int:
+        """Returns the index of the next randomly selected puzzle.
+
+        Indices are drawn in blocks, so that `reset` rarely calls the random number
+        generator.
+        """
+        if self._puzzle_index_cursor == len(self._puzzle_indices):
+            self._puzzle_indices = self._random_generator.integers(
+                len(self._puzzle_paths), size=_PUZZLE_INDEX_BLOCK_SIZE
+            ).tolist()
+            self._puzzle_index_cursor = 0
+
+        puzzle_idx = self._puzzle_indices[self._puzzle_index_cursor]
+        self._puzzle_index_cursor += 1
+        return puzzle_idx
+
+    def _render_observation(self) -> Optional[np.ndarray]:
+        """Returns the observation of the current state, or None if `return_obs` is
+        False."""
+        if not self._return_obs:
+            return None
+
+        return self._render_obs(
+            self._current_puzzle, self._current_state, out=self._observation_buffer()
+        )
+
+    def _observation_buffer(self) -> Optional[np.ndarray]:
+        """Returns the preallocated array into which the next observation is
+        rendered, or None if `copy_obs` is True."""
+        if self._copy_obs:
+            return None
+
+        # Observations are not padded, so their shape depends on the puzzle.
+        width, height = self._current_puzzle.dimensions
+        if self._obs_buf.shape[:2] != (height, width):
+            self._obs_buf = np.empty(
+                (height, width) + self._obs_buf.shape[2:], dtype=self._obs_buf.dtype
+            )
+
+        return self._obs_buf
+
     def render(self) -> Optional[np.ndarray]:
         """Renders the current puzzle state as an RGB array or to a window."""
 
@@ -310,19 +395,18 @@ class PushWorldEnv(gym.Env):
         )
 
         if self.render_mode == "human":
-            # Initialize window if it doesn't exist
-            if self.window is None:
+            # Initialize the window if it doesn't exist, or resize it if the
+            # current puzzle has different dimensions
+            if self.window is None or self.window_size != rgb_array.shape[:2]:
                 pygame.display.set_caption("PushWorld")
                 self.window_size = rgb_array.shape[:2]
                 self.window = pygame.display.set_mode(
                     (self.window_size[1], self.window_size[0])
                 )
 
-            # Convert numpy array to pygame surface
-            surf = pygame.surfarray.make_surface(rgb_array)
-
-            # Display the surface
-            self.window.blit(surf, (0, 0))
+            # Copy the image straight into the window surface instead of creating a
+            # new surface every frame. Surface arrays are indexed by (x, y).
+            pygame.surfarray.blit_array(self.window, rgb_array.swapaxes(0, 1))
             pygame.event.pump()
             pygame.display.update()
 
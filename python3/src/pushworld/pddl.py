@@ -71,7 +71,7 @@ from pushworld.config import (
     PROBLEM_SUFFIX,
     PUZZLE_EXTENSION,
 )
-from pushworld.puzzle import AGENT_IDX, PushWorldPuzzle, points_overlap
+from pushworld.puzzle import AGENT_IDX, PushWorldPuzzle, points_overlap_map
 from pushworld.utils.filesystem import map_files_with_extension
 
 domain_template = """(define
@@ -276,11 +276,19 @@ def puzzle_to_pddl(
         obj_free_positions = []
         collision_free_positions.append(obj_free_positions)
 
-        for x, y in itertools.product(
-            range(width - 1 - size[0]),
-            range(height - 1 - size[1]),
-        ):
-            if points_overlap(obj.cells, wall_positions, (x + 1, y + 1)):
+        num_x = width - 1 - size[0]
+        num_y = height - 1 - size[1]
+        if num_x <= 0 or num_y <= 0:
+            continue
+
+        # Find the wall collisions in all positions at once. The object at position
+        # (x, y) is at (x + 1, y + 1) in the puzzle.
+        wall_overlaps = points_overlap_map(
+            obj.cells, wall_positions, (1, 1), (num_x, num_y)
+        )[1:-1, 1:-1].tolist()
+
+        for x, y in itertools.product(range(num_x), range(num_y)):
+            if wall_overlaps[y][x]:
                 wall_collisions += " " * 8 + f"(wall-collision {name} pos{x}-{y})\n"
             else:
                 obj_free_positions.append((x, y))
@@ -311,19 +319,33 @@ def puzzle_to_pddl(
 
         for j, obj_b in enumerate(puzzle.movable_objects[i + 1 :], start=i + 1):
             name_b = object_names[j]
-            offsets_to_collisions = {}
-
-            for (x_a, y_a), (x_b, y_b) in itertools.product(
-                collision_free_positions[i], collision_free_positions[j]
-            ):
-                offset = (x_a - x_b, y_a - y_b)
-                if offset in offsets_to_collisions:
-                    in_collision = offsets_to_collisions[offset]
-                else:
-                    in_collision = points_overlap(obj_a.cells, obj_b.cells, offset)
-                    offsets_to_collisions[offset] = in_collision
-
-                if in_collision:
+
+            # The objects can only overlap when the offset of `obj_a` relative to
+            # `obj_b` is small enough for their sizes, so only those offsets are
+            # checked.
+            min_offset = (1 - object_sizes[i][0], 1 - object_sizes[i][1])
+            max_offset = (object_sizes[j][0] - 1, object_sizes[j][1] - 1)
+            offset_overlaps = points_overlap_map(
+                obj_a.cells, obj_b.cells, min_offset, max_offset
+            )[1:-1, 1:-1]
+            dys, dxs = np.nonzero(offset_overlaps)
+            collision_offsets = list(
+                zip((dxs + min_offset[0]).tolist(), (dys + min_offset[1]).tolist())
+            )
+
+            # Visit the colliding positions of `obj_b` in the same order as their
+            # collision-free positions.
+            free_positions_b = collision_free_positions[j]
+            free_indices_b = {pos: k for k, pos in enumerate(free_positions_b)}
+
+            for x_a, y_a in collision_free_positions[i]:
+                colliding_indices_b = sorted(
+                    free_indices_b[pos]
+                    for pos in ((x_a - dx, y_a - dy) for dx, dy in collision_offsets)
+                    if pos in free_indices_b
+                )
+
+                for x_b, y_b in map(free_positions_b.__getitem__, colliding_indices_b):
                     if for_bfws:
                         a_to_b_collision = (
                             f"(in-collision {name_a}-{name_b} pos{x_a}-{y_a} "
@@ -12,9 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
+import operator
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Iterable, List, Set, Tuple
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 import numpy as np
 
@@ -50,11 +52,32 @@ class Actions:
     )
 
 
+# `Actions.DISPLACEMENTS` as tuples of Python ints, which are much faster than NumPy
+# arrays for adding to a single position.
+_DISPLACEMENTS = tuple(map(tuple, Actions.DISPLACEMENTS.tolist()))
+
+
+# Maps each element of the image in `PushWorldPuzzle.render_simple` to its one-hot
+# channels. Empty positions (0) have no channel.
+_SIMPLE_ONE_HOT = np.eye(5, dtype=np.float32)[:, 1:]
+
 # Type aliases
 Point = Tuple[int, int]
 State = Tuple[Point, ...]
 Color = Tuple[int, int, int]  # (red, green, blue) with range 0 - 255
 
+# The integer type of the state arrays used by `PushWorldPuzzle.get_next_states`.
+STATE_DTYPE = np.int16
+
+# A pre-drawn image of one cell of an object, along with a mask of the pixels to
+# draw, or None if every pixel is drawn.
+CellTile = Tuple[np.ndarray, Optional[np.ndarray]]
+
+# A pre-drawn image of a whole object, along with the (x, y) cell of its top-left
+# corner relative to the object's position and a mask with the same shape as the
+# image of the pixels to draw, or None if every pixel is drawn.
+ObjectPatch = Tuple[Point, np.ndarray, Optional[np.ndarray]]
+
 
 def hex_to_rgb(hex_string: str) -> Color:
     """Converts a standard 6-digit hex color into a tuple of decimal
@@ -117,6 +140,8 @@ class PushWorldPuzzle:
     Methods:
         get_next_state: Returns the state that results from performing an action from a
             given state.
+        get_next_states: Returns the states that result from performing an action
+            from each of many states.
         count_achieved_goals: Returns the number of objects that are in their goal
             positions in a given state.
         is_goal_state: Returns whether the given state satisfies the goal of this
@@ -132,26 +157,11 @@ class PushWorldPuzzle:
 
         self._name = file_path.split("/")[-1].split(".")[0]
 
-        with open(file_path, "r") as fi:
-            elems_per_row = -1
-            for line_idx, line in enumerate(fi):
-                y = line_idx + 1
-                line_elems = line.split()
-                if y == 1:
-                    elems_per_row = len(line_elems)
-                else:
-                    if elems_per_row != len(line_elems):
-                        raise ValueError(
-                            f"Row {y} does not have the same number of elements as "
-                            "the first row."
-                        )
-
-                for x in range(1, len(line_elems) + 1):
-                    cell_elems = line_elems[x - 1].split("+")
-                    for elem_id in cell_elems:
-                        elem_id = elem_id.lower()
-                        if elem_id != ".":
-                            obj_pixels[elem_id].add((x, y))
+        cells_by_token, x, y = _read_puzzle_cells(file_path)
+        for token, cells in cells_by_token.items():
+            for elem_id in token.lower().split("+"):
+                if elem_id != ".":
+                    obj_pixels[elem_id].update(cells)
 
         if "a" not in obj_pixels:
             raise ValueError(
@@ -186,9 +196,8 @@ class PushWorldPuzzle:
             if elem_id == "w" or elem_id == "aw":
                 position = (0, 0)
             else:
-                xx, yy = zip(*pixels)
                 # We are getting the coordinates to use as the object's frame of reference
-                position = (min(xx), min(yy))
+                position, _ = _get_bounds(pixels)
 
             pixels = subtract_from_points(pixels, position)
             # Here, obj_pixels stores coordinates of objects relative to the position variable above
@@ -261,62 +270,121 @@ class PushWorldPuzzle:
 
         # Goal state is the coordinate of the goal object
         self._goal_state = tuple(self._goal_state)
+        # The goal objects are the movables that follow the agent in each state
+        self._goal_end = 1 + len(self._goal_state)
         # Initial state is the coordinate of the movable objects (including agents and boxes)
         self._initial_state = tuple(object_positions[elem_id] for elem_id in movables)
 
+        # All states share the same tuple for each position, which saves the memory
+        # of storing many states (e.g. in a search) and speeds up comparing them.
+        positions = {position: position for position in self._initial_state}
+        self._initial_state = tuple(positions[p] for p in self._initial_state)
+        self._move_tables = [
+            _MoveTable(positions, displacement) for displacement in _DISPLACEMENTS
+        ]
+
         # Create all collision data structures
 
         num_movables = self.num_movables = len(movables)
         self._agent_collision_map = [set() for i in range(NUM_ACTIONS)]
         self._wall_collision_map = [
-            [set() for i in range(num_movables)] for a in range(NUM_ACTIONS)
+            [frozenset() for i in range(num_movables)] for a in range(NUM_ACTIONS)
         ]
         self._movable_collision_map = [
-            [[set() for i in range(num_movables)] for j in range(num_movables)]
+            [[frozenset() for i in range(num_movables)] for j in range(num_movables)]
             for a in range(NUM_ACTIONS)
         ]
 
         # Populate the actor collisions
-        for a in range(NUM_ACTIONS):
-            obj_pixels["aw"].update(obj_pixels["w"])
-            _populate_static_collisions(
-                collision_positions=self._agent_collision_map[a],
-                action=a,
-                object_pixels=obj_pixels["a"],
-                static_obstacle_pixels=obj_pixels["aw"],
-                width=width,
-                height=height,
-            )
+        obj_pixels["aw"].update(obj_pixels["w"])
+        _populate_static_collisions(
+            collision_positions=self._agent_collision_map,
+            object_pixels=obj_pixels["a"],
+            static_obstacle_pixels=obj_pixels["aw"],
+            width=width,
+            height=height,
+        )
+
+        # Movables often have the same shape (e.g. single-cell boxes), and their
+        # collisions only depend on their shapes. Collisions are computed once per
+        # shape and frozen, so that every movable with that shape shares them.
+        shapes = [frozenset(obj_pixels[elem_id]) for elem_id in movables]
+        wall_collisions = {}
+        movable_collisions = {}
 
         # Populate the wall collisions of all movables other than the agent
         for m in range(1, num_movables):
-            for a in range(NUM_ACTIONS):
+            key = shapes[m]
+            if key not in wall_collisions:
+                collisions = [set() for a in range(NUM_ACTIONS)]
                 _populate_static_collisions(
-                    collision_positions=self._wall_collision_map[a][m],
-                    action=a,
+                    collision_positions=collisions,
                     object_pixels=obj_pixels[movables[m]],
                     static_obstacle_pixels=obj_pixels["w"],
                     width=width,
                     height=height,
                 )
+                wall_collisions[key] = [frozenset(c) for c in collisions]
+            for a in range(NUM_ACTIONS):
+                self._wall_collision_map[a][m] = wall_collisions[key][a]
 
         # Populate the collisions between all movables. There is no need to store
         # collisions caused by movables pushing the agent, since the agent is the
         # cause of all movement.
         for pusher in range(num_movables):
             for pushee in range(1, num_movables):
-                for a in range(NUM_ACTIONS):
+                key = (shapes[pusher], shapes[pushee])
+                if key not in movable_collisions:
+                    collisions = [set() for a in range(NUM_ACTIONS)]
                     _populate_dynamic_collisions(
-                        collision_positions=(
-                            self._movable_collision_map[a][pusher][pushee]
-                        ),
-                        action=a,
+                        collision_positions=collisions,
                         pusher_pixels=obj_pixels[movables[pusher]],
                         pushee_pixels=obj_pixels[movables[pushee]],
                     )
+                    movable_collisions[key] = [frozenset(c) for c in collisions]
+                for a in range(NUM_ACTIONS):
+                    collisions = movable_collisions[key][a]
+                    self._movable_collision_map[a][pusher][pushee] = collisions
+
+        # For each action and pusher, the (pushee, pushee bit, movable collisions,
+        # wall collisions) of every other movable that the pusher can push, which
+        # gathers all lookups of the inner loop of `get_next_state`.
+        self._push_candidates = [
+            [
+                tuple(
+                    (
+                        pushee,
+                        1 << pushee,
+                        self._movable_collision_map[a][pusher][pushee],
+                        self._wall_collision_map[a][pushee],
+                    )
+                    for pushee in range(1, num_movables)
+                    if pushee != pusher
+                    and self._movable_collision_map[a][pusher][pushee]
+                )
+                for pusher in range(num_movables)
+            ]
+            for a in range(NUM_ACTIONS)
+        ]
+
+        # Maps (pixels_per_cell, border_width) to the cell tiles of every object,
+        # indexed by the `id` of the object. See `render`.
+        self._cell_tiles: Dict[Tuple[int, int], Dict[int, List]] = {}
+
+        # Maps (pixels_per_cell, border_width) to the image patch of every object,
+        # indexed by the `id` of the object. See `render`.
+        self._object_patches: Dict[Tuple[int, int], Dict[int, ObjectPatch]] = {}
+
+        # Maps (pixels_per_cell, border_width) to a rendered image of the walls.
+        self._render_backgrounds: Dict[Tuple[int, int], np.ndarray] = {}
 
-        self._pushed_objects = np.zeros((num_movables,), bool)
-        self._pushed_objects[AGENT_IDX] = True
+        # The walls drawn by `render_simple`, which are only drawn when it is first
+        # called.
+        self._simple_background = None
+
+        # Dense versions of the collision maps, which are only built when
+        # `get_next_states` is first called.
+        self._collision_grids = None
 
     @property
     def name(self) -> str:
@@ -360,67 +428,203 @@ class PushWorldPuzzle:
     def get_next_state(self, state: State, action: int) -> State:
         """Returns the state that results from performing the `action` in the given
         `state`."""
-        agent_pos = state[AGENT_IDX]
-
-        if agent_pos in self._agent_collision_map[action]:
-            return state  # the actor cannot move
+        next_state = self._move(state, action)
+        return state if next_state is None else next_state
 
-        walls = self._wall_collision_map[action]
-        frontier = [AGENT_IDX]
+    def get_successor_states(self, state: State) -> List[State]:
+        """Returns the states that result from performing each action in the given
+        `state`.
 
-        while frontier:
-            movable_idx = frontier.pop()
-            movable_pos = state[movable_idx]
-            movable_collisions = self._movable_collision_map[action][movable_idx]
+        This is equivalent to `[self.get_next_state(state, a) for a in
+        range(NUM_ACTIONS)]`, which is convenient for expanding states in a search.
 
-            for obstacle_idx in range(1, self.num_movables):
-                if self._pushed_objects[obstacle_idx]:
+        Returns:
+            A list where element `a` contains the next state for action `a`.
+        """
+        successors = []
+        for action in range(NUM_ACTIONS):
+            next_state = self._move(state, action)
+            successors.append(state if next_state is None else next_state)
+        return successors
+
+    def _move(self, state: State, action: int) -> Optional[State]:
+        """Implements `get_next_state`, but returns None if nothing moves."""
+        if state[AGENT_IDX] in self._agent_collision_map[action]:
+            return None  # the actor cannot move
+
+        push_candidates = self._push_candidates[action]
+
+        # The indices of all pushed movables. Iterating over the list also visits the
+        # movables that are appended to it, so it doubles as the search frontier.
+        pushed_indices = [AGENT_IDX]
+
+        # Bit i is set if movable i is pushed. The agent is always pushed.
+        pushed = 1 << AGENT_IDX
+
+        for movable_idx in pushed_indices:
+            movable_x, movable_y = state[movable_idx]
+
+            for (
+                obstacle_idx,
+                obstacle_bit,
+                movable_collisions,
+                obstacle_walls,
+            ) in push_candidates[movable_idx]:
+                if pushed & obstacle_bit:
                     continue  # already pushed
 
                 # Is obstacle_idx pushed by movable_idx?
                 obstacle_pos = state[obstacle_idx]
-                relative_pos = tuple(np.subtract(movable_pos, obstacle_pos))
+                relative_pos = (
+                    movable_x - obstacle_pos[0],
+                    movable_y - obstacle_pos[1],
+                )
 
-                if relative_pos not in movable_collisions[obstacle_idx]:
+                if relative_pos not in movable_collisions:
                     continue  # obstacle_idx is not pushed by movable_idx
 
                 # obstacle_idx is being pushed by movable_idx
-                if obstacle_pos in walls[obstacle_idx]:
+                if obstacle_pos in obstacle_walls:
                     # transitive stopping; nothing can move.
-                    self._pushed_objects[1:] = False
-                    return state
+                    return None
 
-                self._pushed_objects[obstacle_idx] = True
-                frontier.append(obstacle_idx)
+                pushed |= obstacle_bit
+                pushed_indices.append(obstacle_idx)
 
         next_state = list(state)
-        displacement = Actions.DISPLACEMENTS[action]
-        next_state[0] = tuple(displacement + state[0])
-        for i in range(1, self.num_movables):
-            if self._pushed_objects[i]:
-                next_state[i] = tuple(displacement + state[i])
-                self._pushed_objects[i] = False
-            else:
-                next_state[i] = state[i]
+        moves = self._move_tables[action]
+        for i in pushed_indices:
+            next_state[i] = moves[state[i]]
 
         return tuple(next_state)
 
+    def get_next_states(self, states: np.ndarray, action: int) -> np.ndarray:
+        """Returns the states that result from performing the `action` in each of
+        the given `states`.
+
+        This is equivalent to calling `get_next_state` for every state, but all
+        states are processed together with array operations, which is much faster
+        for large batches (e.g. when expanding the frontier of a search).
+
+        Args:
+            states: An integer array with shape (num_states, num_movables, 2), where
+                `states[i]` contains the (x, y) positions of a `State`. See
+                `states_to_array`.
+            action: The action to perform in every state.
+
+        Returns:
+            An array with the same shape and type as `states` that contains the next
+            states.
+        """
+        if self._collision_grids is None:
+            self._collision_grids = self._build_collision_grids()
+        agent_grid, wall_grid, movable_grid, offset = self._collision_grids
+        agent_grid = agent_grid[action]
+        wall_grid = wall_grid[action]
+        movable_grid = movable_grid[action]
+
+        states = np.asarray(states)
+        x = states[:, :, 0]
+        y = states[:, :, 1]
+        movable_indices = np.arange(self.num_movables)
+        pushers = movable_indices[:, np.newaxis]
+        pushees = movable_indices[np.newaxis, :]
+
+        # Find all movables that are transitively pushed by the agent. Each pass
+        # adds the movables that are pushed by those found in the previous pass.
+        pushed = np.zeros(x.shape, bool)
+        pushed[:, AGENT_IDX] = True
+        frontier = pushed.copy()
+        relative_x = x[:, :, np.newaxis] - x[:, np.newaxis, :] + offset[0]
+        relative_y = y[:, :, np.newaxis] - y[:, np.newaxis, :] + offset[1]
+        collisions = movable_grid[pushers, pushees, relative_x, relative_y]
+        for _ in range(self.num_movables - 1):
+            frontier = (collisions & frontier[:, :, np.newaxis]).any(axis=1) & ~pushed
+            if not frontier.any():
+                break
+            pushed |= frontier
+
+        # Nothing moves if the agent or any pushed movable collides with a wall.
+        blocked = agent_grid[x[:, AGENT_IDX], y[:, AGENT_IDX]]
+        blocked |= (pushed & wall_grid[pushees, x, y]).any(axis=1)
+        pushed &= ~blocked[:, np.newaxis]
+
+        displacement = Actions.DISPLACEMENTS[action].astype(states.dtype)
+        return states + pushed[:, :, np.newaxis] * displacement
+
+    def _build_collision_grids(
+        self,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Point]:
+        """Converts the collision maps into dense `bool` arrays for
+        `get_next_states`.
+
+        Returns:
+            A tuple of (agent_grid, wall_grid, movable_grid, offset):
+            - agent_grid[a, x, y] is whether `(x, y)` is in
+              `self._agent_collision_map[a]`.
+            - wall_grid[a, m, x, y] is whether `(x, y)` is in
+              `self._wall_collision_map[a][m]`.
+            - movable_grid[a, i, j, x, y] is whether `(x, y) - offset` is in
+              `self._movable_collision_map[a][i][j]`.
+        """
+        num_movables = self.num_movables
+        grid_shape = (self._width + 1, self._height + 1)
+
+        agent_grid = np.zeros((NUM_ACTIONS,) + grid_shape, bool)
+        wall_grid = np.zeros((NUM_ACTIONS, num_movables) + grid_shape, bool)
+        for a in range(NUM_ACTIONS):
+            for x, y in self._agent_collision_map[a]:
+                agent_grid[a, x, y] = True
+            for m in range(num_movables):
+                for x, y in self._wall_collision_map[a][m]:
+                    wall_grid[a, m, x, y] = True
+
+        # Relative positions between movables range from -(width, height) to
+        # (width, height), and are shifted by the offset to index the grid.
+        offset = (self._width, self._height)
+        movable_grid = np.zeros(
+            (
+                NUM_ACTIONS,
+                num_movables,
+                num_movables,
+                2 * offset[0] + 1,
+                2 * offset[1] + 1,
+            ),
+            bool,
+        )
+        for a in range(NUM_ACTIONS):
+            for i in range(num_movables):
+                for j in range(num_movables):
+                    for x, y in self._movable_collision_map[a][i][j]:
+                        if abs(x) <= offset[0] and abs(y) <= offset[1]:
+                            movable_grid[a, i, j, x + offset[0], y + offset[1]] = True
+
+        return agent_grid, wall_grid, movable_grid, offset
+
     def count_achieved_goals(self, state: State) -> int:
         """Returns the number of objects that are in their goal positions in a
         given state."""
-        count = 0
-
-        for entity, goal_entity in zip(
-            state[1 : 1 + len(self._goal_state)], self._goal_state
-        ):
-            if entity == goal_entity:
-                count += 1
-
-        return count
+        return sum(map(operator.eq, state[1 : self._goal_end], self._goal_state))
 
     def is_goal_state(self, state: State) -> bool:
         """Returns whether the given state satisfies the goal of this puzzle."""
-        return state[1 : 1 + len(self._goal_state)] == self._goal_state
+        return state[1 : self._goal_end] == self._goal_state
+
+    def are_goal_states(self, states: np.ndarray) -> np.ndarray:
+        """Returns whether each of the given states satisfies the goal of this puzzle.
+
+        This is the batched version of `is_goal_state`.
+
+        Args:
+            states: An integer array with shape (num_states, num_movables, 2), as in
+                `get_next_states`.
+
+        Returns:
+            A `bool` array with shape (num_states,).
+        """
+        states = np.asarray(states)
+        goal_state = np.array(self._goal_state, dtype=states.dtype).reshape(-1, 2)
+        return (states[:, 1 : 1 + len(goal_state)] == goal_state).all(axis=(1, 2))
 
     def is_valid_plan(self, plan: Iterable[int]) -> bool:
         """Returns whether the sequence of actions in the plan achieves the goal,
@@ -459,30 +663,97 @@ class PushWorldPuzzle:
         if pixels_per_cell < 1 + 2 * border_width:
             raise ValueError("pixels_per_cell must be >= 1 + 2*border_width")
 
-        image_shape = (self._height * pixels_per_cell, self._width * pixels_per_cell, 3)
-        image = np.ones(image_shape, np.uint8) * 255
+        image = self._get_background(border_width, pixels_per_cell).copy()
+
+        object_patches = self._get_object_patches(border_width, pixels_per_cell)
+        for obj, pos in self._foreground_objects(state):
+            _draw_object_patch(
+                object_patch=object_patches[id(obj)],
+                position=pos,
+                image=image,
+                pixels_per_cell=pixels_per_cell,
+            )
+
+        return image
 
+    def _background_objects(self) -> List[Tuple[PushWorldObject, Point]]:
+        """Returns the (object, position) pairs of the walls, which are drawn below
+        all other objects by `render`."""
         objects = [(self._walls, self._walls.position)]
         if self._agent_walls is not None:
             objects.insert(0, (self._agent_walls, self._agent_walls.position))
+        return objects
 
-        objects += zip(self._movable_objects, state)
+    def _foreground_objects(self, state: State) -> List[Tuple[PushWorldObject, Point]]:
+        """Returns the (object, position) pairs of the movables and goals in the given
+        state, in the order in which they are drawn over the background by
+        `render`."""
+        objects = list(zip(self._movable_objects, state))
         objects += [(g, g.position) for g in self._goals]
-
-        for obj, pos in objects:
-            _draw_object(
-                obj=obj,
-                position=pos,
-                image=image,
-                pixels_per_cell=pixels_per_cell,
-                border_width=border_width,
+        return objects
+
+    def _get_background(self, border_width: int, pixels_per_cell: int) -> np.ndarray:
+        """Returns a read-only image of the walls, which never move. It is drawn once
+        for each set of rendering parameters."""
+        background_key = (pixels_per_cell, border_width)
+        if background_key not in self._render_backgrounds:
+            image_shape = (
+                self._height * pixels_per_cell,
+                self._width * pixels_per_cell,
+                3,
             )
+            image = np.full(image_shape, 255, np.uint8)
+
+            object_patches = self._get_object_patches(border_width, pixels_per_cell)
+            for obj, pos in self._background_objects():
+                _draw_object_patch(
+                    object_patch=object_patches[id(obj)],
+                    position=pos,
+                    image=image,
+                    pixels_per_cell=pixels_per_cell,
+                )
 
-        return image
+            image.flags.writeable = False
+            self._render_backgrounds[background_key] = image
+
+        return self._render_backgrounds[background_key]
+
+    def _get_cell_tiles(
+        self, border_width: int, pixels_per_cell: int
+    ) -> Dict[int, List[Tuple[Point, CellTile]]]:
+        """Returns the cell tiles of every object, indexed by the `id` of the object.
+
+        The cell tiles of every object only depend on the rendering parameters, so
+        they are drawn once and reused by later renders.
+        """
+        tiles_key = (pixels_per_cell, border_width)
+        if tiles_key not in self._cell_tiles:
+            objects = self._background_objects()
+            objects += self._foreground_objects(self._initial_state)
+            self._cell_tiles[tiles_key] = {
+                id(obj): _make_object_tiles(obj, pixels_per_cell, border_width)
+                for obj, _ in objects
+            }
+        return self._cell_tiles[tiles_key]
+
+    def _get_object_patches(
+        self, border_width: int, pixels_per_cell: int
+    ) -> Dict[int, ObjectPatch]:
+        """Returns the image patch of every object, indexed by the `id` of the
+        object. Like cell tiles, the patches are only drawn once."""
+        patches_key = (pixels_per_cell, border_width)
+        if patches_key not in self._object_patches:
+            cell_tiles = self._get_cell_tiles(border_width, pixels_per_cell)
+            self._object_patches[patches_key] = {
+                obj_id: _make_object_patch(object_tiles, pixels_per_cell)
+                for obj_id, object_tiles in cell_tiles.items()
+            }
+        return self._object_patches[patches_key]
 
     def render_simple(
         self,
         state: State,
+        out: Optional[np.ndarray] = None,
     ) -> np.ndarray:
         """Creates a simplified representation of the given state. We return a 2D array where each element encodes
         the identity of the object in the corresponding position.
@@ -494,43 +765,43 @@ class PushWorldPuzzle:
 
         Args:
             state: The state to render.
-            border_width: The pixel width of the border drawn to indicate object
-                boundaries. Must be >= 1.
-            pixels_per_cell: The pixel width and height of a discrete position in the
-                environment. Must be >= 1 + 2 * border_width.
+            out: If not None, the result is written into this `float32` array of
+                shape (height, width, 4) instead of a newly allocated array.
 
         Returns:
-            The 2D array of shape (height, width) with integer values.
+            The one-hot array of shape (height, width, 4) with `float32` type.
         """
 
-        # 2D np array of size self._height and self._width
-        image = np.zeros((self._height, self._width), np.uint8)
+        # The walls never move, so they are drawn once and copied for every state.
+        if self._simple_background is None:
+            background = np.zeros((self._height, self._width), np.uint8)
+            wall_xs, wall_ys = zip(*self._walls.cells)
+            background[wall_ys, wall_xs] = 3
+            self._simple_background = background
 
-        # Loop through self._walls and populate the image with 3s
-        for wall_coord in self._walls.cells:
-            image[wall_coord] = 3
+        image = self._simple_background.copy()
 
-        # First movable object is the agent
-        image[state[0]] = 1
+        # First movable object is the agent. Rows are indexed by y, columns by x.
+        agent_x, agent_y = state[0]
+        image[agent_y, agent_x] = 1
 
-        # Loop through self._movable_objects and populate the image with 2s
-        for movable_coord in state[1:]:
-            image[movable_coord] = 2
+        # The remaining movable objects
+        if len(state) > 1:
+            movable_xs, movable_ys = zip(*state[1:])
+            image[movable_ys, movable_xs] = 2
 
-        # Loop through self._goals and populate the image with 4s
-        for goal_coord in self._goal_state:
-            image[goal_coord] = 4
+        if self._goal_state:
+            goal_xs, goal_ys = zip(*self._goal_state)
+            image[goal_ys, goal_xs] = 4
 
-        # Create empty tensor [4, height, width]
-        one_hot = np.zeros((4, self._height, self._width), dtype=np.float32)
-        # Fill in the one-hot channels
-        for i in range(1, 5):  # For each object type (0-3)
-            one_hot[i - 1] = (image == i).astype(np.float32)
+        # Height, width, channel (H x W x C)
+        if out is None:
+            out = np.empty((self._height, self._width, 4), dtype=np.float32)
 
-        # Reshape to height, width, channel (H x W x C)
-        one_hot = one_hot.transpose(1, 2, 0)
+        # Look up the one-hot channels of every element at once
+        np.take(_SIMPLE_ONE_HOT, image, axis=0, out=out)
 
-        return one_hot
+        return out
 
     def render_plan(
         self,
@@ -558,14 +829,39 @@ class PushWorldPuzzle:
         )
         images = [image]
 
+        # Only the cells covered by objects that moved are redrawn in each frame.
+        background = self._get_background(border_width, pixels_per_cell)
+        cell_tiles = self._get_cell_tiles(border_width, pixels_per_cell)
+
         for action in plan:
-            state = self.get_next_state(state, action)
-            image = self.render(
-                state=state,
-                border_width=border_width,
-                pixels_per_cell=pixels_per_cell,
-            )
+            next_state = self.get_next_state(state, action)
+            image = image.copy()
+
+            dirty_cells = set()
+            for obj, position, next_position in zip(
+                self._movable_objects, state, next_state
+            ):
+                if position != next_position:
+                    for x, y in (position, next_position):
+                        dirty_cells.update((x + cx, y + cy) for cx, cy in obj.cells)
+
+            for x, y in dirty_cells:
+                rows = slice(y * pixels_per_cell, (y + 1) * pixels_per_cell)
+                columns = slice(x * pixels_per_cell, (x + 1) * pixels_per_cell)
+                image[rows, columns] = background[rows, columns]
+
+            if dirty_cells:
+                for obj, pos in self._foreground_objects(next_state):
+                    _draw_object(
+                        object_tiles=cell_tiles[id(obj)],
+                        position=pos,
+                        image=image,
+                        pixels_per_cell=pixels_per_cell,
+                        cells=dirty_cells,
+                    )
+
             images.append(image)
+            state = next_state
 
         return images
 
@@ -584,26 +880,13 @@ class BraindeadPushWorldPuzzle(PushWorldPuzzle):
         obj_pixels = defaultdict(set)
 
         # Parse puzzle file
-        with open(file_path, "r") as fi:
-            elems_per_row = -1
-            for line_idx, line in enumerate(fi):
-                y = line_idx + 1
-                line_elems = line.split()
-                if y == 1:
-                    elems_per_row = len(line_elems)
-                else:
-                    if elems_per_row != len(line_elems):
-                        raise ValueError(
-                            f"Row {y} does not have the same number of elements as "
-                            "the first row."
-                        )
-
-                for x in range(1, len(line_elems) + 1):
-                    elem_id = line_elems[x - 1].lower()
-                    if elem_id == "a":  # Agent
-                        obj_pixels["a"].add((x, y))
-                    elif elem_id.startswith("g"):  # Goal
-                        obj_pixels["g1"].add((x, y))
+        cells_by_token, x, y = _read_puzzle_cells(file_path)
+        for token, cells in cells_by_token.items():
+            elem_id = token.lower()
+            if elem_id == "a":  # Agent
+                obj_pixels["a"].update(cells)
+            elif elem_id.startswith("g"):  # Goal
+                obj_pixels["g1"].update(cells)
 
         if "a" not in obj_pixels:
             raise ValueError(
@@ -650,21 +933,9 @@ class BraindeadPushWorldPuzzle(PushWorldPuzzle):
         self._wall_positions = set()
         self._agent_wall_positions = set()
 
-        # For compatibility with parent class
+        # For compatibility with parent class. Braindead puzzles have no collisions,
+        # so they do not need any collision maps.
         self.num_movables = 1  # Just the agent
-        self._agent_collision_map = [set() for _ in range(NUM_ACTIONS)]
-        self._wall_collision_map = [
-            [set() for _ in range(self.num_movables)] for _ in range(NUM_ACTIONS)
-        ]
-        self._movable_collision_map = [
-            [
-                [set() for _ in range(self.num_movables)]
-                for _ in range(self.num_movables)
-            ]
-            for _ in range(NUM_ACTIONS)
-        ]
-        self._pushed_objects = np.zeros((self.num_movables,), bool)
-        self._pushed_objects[AGENT_IDX] = True
 
     def get_next_state(self, state: State, action: int) -> State:
         """Returns the state that results from performing the `action` in the given
@@ -673,16 +944,46 @@ class BraindeadPushWorldPuzzle(PushWorldPuzzle):
         In braindead puzzles, only the agent can move, and it can move freely
         without any wall or obstacle constraints.
         """
-        agent_pos = state[AGENT_IDX]
-        displacement = Actions.DISPLACEMENTS[action]
-        new_pos = tuple(np.add(agent_pos, displacement))
+        x, y = state[AGENT_IDX]
+        dx, dy = _DISPLACEMENTS[action]
+        x += dx
+        y += dy
 
         # Check if the new position is within bounds
-        if 1 <= new_pos[0] <= self._width and 1 <= new_pos[1] <= self._height:
-            return (new_pos,)
+        if 1 <= x <= self._width and 1 <= y <= self._height:
+            return ((x, y),)
         else:
             return state  # Can't move out of bounds
 
+    def get_successor_states(self, state: State) -> List[State]:
+        """Returns the states that result from performing each action in the given
+        `state`.
+
+        See `PushWorldPuzzle.get_successor_states`.
+        """
+        return [self.get_next_state(state, action) for action in range(NUM_ACTIONS)]
+
+    def get_next_states(self, states: np.ndarray, action: int) -> np.ndarray:
+        """Returns the states that result from performing the `action` in each of
+        the given `states`.
+
+        See `PushWorldPuzzle.get_next_states`.
+        """
+        states = np.asarray(states)
+        next_states = states + Actions.DISPLACEMENTS[action].astype(states.dtype)
+        in_bounds = (
+            (next_states >= 1) & (next_states <= (self._width, self._height))
+        ).all(axis=(1, 2))
+        return np.where(in_bounds[:, np.newaxis, np.newaxis], next_states, states)
+
+    def are_goal_states(self, states: np.ndarray) -> np.ndarray:
+        """Returns whether each of the given states satisfies the goal of this puzzle.
+
+        See `PushWorldPuzzle.are_goal_states`.
+        """
+        states = np.asarray(states)
+        return (states[:, AGENT_IDX] == self._goal_position).all(axis=1)
+
     def is_goal_state(self, state: State) -> bool:
         """Returns whether the given state satisfies the goal of this puzzle.
 
@@ -697,28 +998,40 @@ class BraindeadPushWorldPuzzle(PushWorldPuzzle):
     def is_valid_plan(self, plan: Iterable[int]) -> bool:
         """Returns whether the sequence of actions in the plan achieves the goal,
         starting from the initial state."""
+        goal_position = self._goal_position
+        get_next_state = self.get_next_state
         state = self._initial_state
 
         for action in plan:
-            if self.is_goal_state(state):
+            if state[AGENT_IDX] == goal_position:
                 # goal was achieved before the plan ended
                 return True
-            state = self.get_next_state(state, action)
+            state = get_next_state(state, action)
 
-        return self.is_goal_state(state)
+        return state[AGENT_IDX] == goal_position
 
     def render(
         self,
         state: State,
+        out: Optional[np.ndarray] = None,
     ) -> np.ndarray:
         """Creates a simplified representation of the given state.
 
+        Args:
+            state: The state to render.
+            out: If not None, the result is written into this array of shape
+                (height, width, 2) instead of a newly allocated array.
+
         Returns:
             A 2-channel 2D array where:
             - Channel 0: Agent position (1 where agent is present)
             - Channel 1: Goal position (1 where goal is present)
         """
-        image = np.zeros((self._height, self._width, 2), np.uint8)
+        if out is None:
+            image = np.zeros((self._height, self._width, 2), np.uint8)
+        else:
+            image = out
+            image.fill(0)
 
         # Populate the 1st channel with agent's position
         agent_pos = state[AGENT_IDX]
@@ -731,11 +1044,106 @@ class BraindeadPushWorldPuzzle(PushWorldPuzzle):
         return image
 
 
+def states_to_array(states: Iterable[State]) -> np.ndarray:
+    """Stacks the given states into an array with shape (num_states, num_movables, 2)
+    and type `STATE_DTYPE`, as used by `PushWorldPuzzle.get_next_states`."""
+    return np.array(list(states), dtype=STATE_DTYPE)
+
+
+def array_to_states(states: np.ndarray) -> List[State]:
+    """Converts an array of states, as returned by `PushWorldPuzzle.get_next_states`,
+    into a list of `State` tuples."""
+    return [tuple(map(tuple, state)) for state in np.asarray(states).tolist()]
+
+
+class _MoveTable(dict):
+    """Maps each position to the position that results from moving it by a fixed
+    displacement.
+
+    Entries are added when they are first looked up, so that each resulting position
+    is created only once and shared by every state that contains it.
+
+    Args:
+        positions: Maps each position to its shared tuple. Shared between tables.
+        displacement: The (dx, dy) displacement of every move.
+    """
+
+    def __init__(self, positions: Dict[Point, Point], displacement: Point) -> None:
+        super().__init__()
+        self._positions = positions
+        self._displacement = displacement
+
+    def __missing__(self, position: Point) -> Point:
+        dx, dy = self._displacement
+        next_position = (position[0] + dx, position[1] + dy)
+        next_position = self._positions.setdefault(next_position, next_position)
+        self[position] = next_position
+        return next_position
+
+
+def _read_puzzle_cells(file_path: str) -> Tuple[Dict[str, List[Point]], int, int]:
+    """Reads the cells of a `.pwp` puzzle file.
+
+    Most cells of a puzzle repeat a few tokens (e.g. "." or "w"), so the cells are
+    grouped by token, which lets callers interpret each distinct token only once.
+
+    Args:
+        file_path: The path to a `.pwp` file.
+
+    Returns:
+        A tuple of (cells_by_token, width, height), where `cells_by_token` maps each
+        token in the file to the (x, y) positions of the cells that contain it,
+        starting from (1, 1) in the top-left cell. Empty cells (".") are omitted.
+
+    Raises:
+        ValueError: If the rows of the puzzle have different numbers of cells.
+    """
+    with open(file_path, "r") as fi:
+        rows = [line.split() for line in fi]
+
+    width = len(rows[-1]) if rows else 0
+    for y, row in enumerate(rows[1:], start=2):
+        if len(row) != len(rows[0]):
+            raise ValueError(
+                f"Row {y} does not have the same number of elements as the first row."
+            )
+
+    cells_by_token = defaultdict(list)
+    for y, row in enumerate(rows, start=1):
+        for x, token in enumerate(row, start=1):
+            if token != ".":
+                cells_by_token[token].append((x, y))
+
+    return cells_by_token, width, len(rows)
+
+
 def points_overlap(s1: Set[Point], s2: Set[Point], offset: Point) -> bool:
     """Returns whether there exists a pair of points (p1, p2) in the sets (s1, s2) such
     that p1 + offset == p2."""
-    offset_s2 = subtract_from_points(s2, offset)
-    return bool(s1.intersection(offset_s2))
+    dx, dy = offset
+
+    # Iterate over the smaller set and stop at the first overlapping point.
+    if len(s1) <= len(s2):
+        return any((x + dx, y + dy) in s2 for x, y in s1)
+    else:
+        return any((x - dx, y - dy) in s1 for x, y in s2)
+
+
+def _get_bounds(points: Iterable[Point]) -> Tuple[Point, Point]:
+    """Returns the minimum and maximum (x, y) coordinates of the given non-empty
+    points, found in a single pass."""
+    points = iter(points)
+    min_x, min_y = max_x, max_y = next(points)
+    for x, y in points:
+        if x < min_x:
+            min_x = x
+        elif x > max_x:
+            max_x = x
+        if y < min_y:
+            min_y = y
+        elif y > max_y:
+            max_y = y
+    return (min_x, min_y), (max_x, max_y)
 
 
 def subtract_from_points(points: Set[Point], offset: Point) -> Set[Point]:
@@ -745,21 +1153,20 @@ def subtract_from_points(points: Set[Point], offset: Point) -> Set[Point]:
 
 
 def _populate_static_collisions(
-    collision_positions: Set[Point],
-    action: int,
+    collision_positions: List[Set[Point]],
     object_pixels: Set[Point],
     static_obstacle_pixels: Set[Point],
     width: int,
     height: int,
 ) -> None:
     """Computes the positions in which an object moves into collision with a static
-    obstacle when moving in the direction of the given `action`.
+    obstacle when moving in the direction of each action.
 
     Args:
-        collision_positions: Modified in place. This function adds all positions of the
-            object in which moving the object in the direction of the given `action`
-            results in a collision with a static obstacle.
-        action: The direction of the movement.
+        collision_positions: Modified in place. For each action `a`, this function
+            adds to `collision_positions[a]` all positions of the object in which
+            moving the object in the direction of `a` results in a collision with a
+            static obstacle.
         object_pixels: The pixel positions of the object, measured in the
             object's reference frame.
         static_obstacle_pixels: The pixel positions of static obstacles, measured
@@ -767,97 +1174,338 @@ def _populate_static_collisions(
         width: The maximum x-position of the object.
         height: The maximum y-position of the object.
     """
-    dis_x, dis_y = Actions.DISPLACEMENTS[action]
-
-    xx, yy = zip(*object_pixels)
-    object_size = (max(xx) - min(xx) + 1, max(yy) - min(yy) + 1)
-
-    width -= object_size[0]
-    height -= object_size[1]
-
-    for object_x, object_y in object_pixels:
-        for obstacle_x, obstacle_y in static_obstacle_pixels:
-            dx = -dis_x + obstacle_x - object_x
-            dy = -dis_y + obstacle_y - object_y
-            if (
-                dx >= 0
-                and dy >= 0
-                and dx <= width
-                and dy <= height
-                and not points_overlap(object_pixels, static_obstacle_pixels, (dx, dy))
-            ):
-                collision_positions.add((dx, dy))
+    (min_x, min_y), (max_x, max_y) = _get_bounds(object_pixels)
+    max_position = (
+        width - (max_x - min_x + 1),
+        height - (max_y - min_y + 1),
+    )
+    if max_position[0] < 0 or max_position[1] < 0:
+        return
+
+    collisions = _find_collisions(
+        object_pixels, static_obstacle_pixels, (0, 0), max_position
+    )
+    for positions, action_collisions in zip(collision_positions, collisions):
+        positions.update(action_collisions)
 
 
 def _populate_dynamic_collisions(
-    collision_positions: Set[Point],
-    action: int,
+    collision_positions: List[Set[Point]],
     pusher_pixels: Set[Point],
     pushee_pixels: Set[Point],
 ) -> None:
     """Computes the relative positions between two objects in which one object can
-    push the other when it moves in the direction of the given `action`.
+    push the other when it moves in the direction of each action.
 
     Args:
-        collision_positions: Modified in place. This function adds all positions of the
-            pusher relative to the pushee in which moving the pusher in the direction
-            of the given `action` results in a collision with the pushee.
-        action: The direction of the pushing movement.
+        collision_positions: Modified in place. For each action `a`, this function
+            adds to `collision_positions[a]` all positions of the pusher relative to
+            the pushee in which moving the pusher in the direction of `a` results in
+            a collision with the pushee.
         pusher_pixels: The pixel positions of the pusher object, measured in the
             object's reference frame.
         pushee_pixels: The pixel positions of the pushee object, measured in the
             object's reference frame.
     """
-    dis_x, dis_y = Actions.DISPLACEMENTS[action]
+    pusher_min, pusher_max = _get_bounds(pusher_pixels)
+    pushee_min, pushee_max = _get_bounds(pushee_pixels)
+
+    # The pusher can only collide from a relative position that is at most one
+    # step away from overlapping the pushee.
+    min_position = (
+        pushee_min[0] - pusher_max[0] - 1,
+        pushee_min[1] - pusher_max[1] - 1,
+    )
+    max_position = (
+        pushee_max[0] - pusher_min[0] + 1,
+        pushee_max[1] - pusher_min[1] + 1,
+    )
+
+    collisions = _find_collisions(
+        pusher_pixels, pushee_pixels, min_position, max_position
+    )
+    for positions, action_collisions in zip(collision_positions, collisions):
+        positions.update(action_collisions)
+
+
+def _find_collisions(
+    object_pixels: Set[Point],
+    obstacle_pixels: Set[Point],
+    min_position: Point,
+    max_position: Point,
+) -> List[List[Point]]:
+    """Returns the positions in a rectangle from which an object moves into
+    collision with obstacles in the direction of each action.
+
+    Args:
+        object_pixels: The pixel positions of the object, measured in the
+            object's reference frame.
+        obstacle_pixels: The pixel positions of the obstacles.
+        min_position: The minimum (x, y) position of the object.
+        max_position: The maximum (x, y) position of the object.
+
+    Returns:
+        A list where element `a` contains the collision positions for action `a`.
+    """
+    num_rows = max_position[1] - min_position[1] + 1
+    num_columns = max_position[0] - min_position[0] + 1
+
+    # A position is a collision if the object does not overlap any obstacle there,
+    # but it does after moving. The overlaps do not depend on the action, so they
+    # are computed once for all actions.
+    overlaps = points_overlap_map(
+        object_pixels, obstacle_pixels, min_position, max_position
+    )
+    free = ~overlaps[1:-1, 1:-1]
+
+    collisions = []
+    for dis_x, dis_y in _DISPLACEMENTS:
+        next_overlaps = overlaps[
+            1 + dis_y : num_rows + 1 + dis_y,
+            1 + dis_x : num_columns + 1 + dis_x,
+        ]
+        ys, xs = np.nonzero(next_overlaps & free)
+        collisions.append(
+            list(
+                zip(
+                    (xs + min_position[0]).tolist(),
+                    (ys + min_position[1]).tolist(),
+                )
+            )
+        )
 
-    for pusher_x, pusher_y in pusher_pixels:
-        for pushee_x, pushee_y in pushee_pixels:
-            dx = -dis_x + pushee_x - pusher_x
-            dy = -dis_y + pushee_y - pusher_y
-            if not points_overlap(pusher_pixels, pushee_pixels, (dx, dy)):
-                collision_positions.add((dx, dy))
+    return collisions
+
+
+def points_overlap_map(
+    object_pixels: Set[Point],
+    obstacle_pixels: Set[Point],
+    min_position: Point,
+    max_position: Point,
+) -> np.ndarray:
+    """Computes whether an object overlaps any obstacle at every position in a
+    rectangle.
+
+    Args:
+        object_pixels: The pixel positions of the object, measured in the
+            object's reference frame.
+        obstacle_pixels: The pixel positions of the obstacles.
+        min_position: The minimum (x, y) position of the object.
+        max_position: The maximum (x, y) position of the object.
+
+    Returns:
+        A `bool` array with shape (num_rows + 2, num_columns + 2), where `num_rows`
+        and `num_columns` are the size of the rectangle. The array has a margin of
+        one position around the rectangle: Element [y + 1 - min_y, x + 1 - min_x]
+        is True if the object overlaps an obstacle at position (x, y).
+    """
+    (min_x, min_y), (max_x, max_y) = _get_bounds(object_pixels)
+    map_shape = (
+        max_position[1] - min_position[1] + 3,
+        max_position[0] - min_position[0] + 3,
+    )
+
+    # A bitmap of the obstacles in all cells that the object can occupy, where
+    # element [0, 0] is the cell (x0, y0).
+    x0 = min_position[0] - 1 + min_x
+    y0 = min_position[1] - 1 + min_y
+    grid = np.zeros((map_shape[0] + max_y - min_y, map_shape[1] + max_x - min_x), bool)
+    if obstacle_pixels:
+        obstacles = np.array(list(obstacle_pixels)) - (x0, y0)
+        in_grid = ((obstacles >= 0) & (obstacles < grid.shape[::-1])).all(axis=1)
+        grid[obstacles[in_grid, 1], obstacles[in_grid, 0]] = True
+
+    # Shift the obstacle bitmap by every pixel of the object.
+    overlaps = np.zeros(map_shape, bool)
+    for x, y in object_pixels:
+        r = y - min_y
+        c = x - min_x
+        overlaps |= grid[r : r + map_shape[0], c : c + map_shape[1]]
+
+    return overlaps
+
+
+# The (row, column) offsets of the cells adjacent to a cell. A border is drawn on
+# each side of a cell whose adjacent cell is not part of the same object.
+_BORDER_OFFSETS = (
+    (-1, 0),
+    (1, 0),
+    (0, -1),
+    (0, 1),
+    (-1, -1),
+    (-1, 1),
+    (1, -1),
+    (1, 1),
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _make_cell_tile(
+    fill_color: Optional[Color],
+    border_color: Color,
+    has_neighbors: Tuple[bool, ...],
+    pixels_per_cell: int,
+    border_width: int,
+) -> CellTile:
+    """Draws one cell of an object.
+
+    Args:
+        fill_color: The color with which to fill the cell, or None if the cell is
+            transparent.
+        border_color: The color of the cell's borders.
+        has_neighbors: For each offset in `_BORDER_OFFSETS`, whether the adjacent
+            cell belongs to the same object. Borders are drawn towards all other
+            cells.
+        pixels_per_cell: The pixel width and height of a discrete position.
+        border_width: The pixel width of the border that highlights object boundaries.
+
+    Returns:
+        The cell image with shape (pixels_per_cell, pixels_per_cell, 3) and type
+        `uint8`, and the mask of pixels that belong to the cell with the same shape,
+        or None if the cell is fully opaque.
+    """
+    tile = np.zeros((pixels_per_cell, pixels_per_cell, 3), np.uint8)
+    # A mask with a channel axis is much faster to copy with than a broadcast one.
+    mask = np.zeros((pixels_per_cell, pixels_per_cell, 3), bool)
+
+    if fill_color is not None:
+        tile[:, :] = fill_color
+        mask[:, :] = True
+
+    for (dr, dc), has_neighbor in zip(_BORDER_OFFSETS, has_neighbors):
+        if not has_neighbor:
+            r1 = max(0, dr) * (pixels_per_cell - border_width)
+            r2 = (r1 + pixels_per_cell) if dr == 0 else (r1 + border_width)
+            c1 = max(0, dc) * (pixels_per_cell - border_width)
+            c2 = (c1 + pixels_per_cell) if dc == 0 else (c1 + border_width)
+            tile[r1:r2, c1:c2] = border_color
+            mask[r1:r2, c1:c2] = True
+
+    tile.flags.writeable = False
+    if mask.all():
+        return tile, None
+
+    mask.flags.writeable = False
+    return tile, mask
+
+
+def _make_object_tiles(
+    obj: PushWorldObject, pixels_per_cell: int, border_width: int
+) -> List[Tuple[Point, CellTile]]:
+    """Returns the (cell, tile) pairs that draw the given object.
+
+    Args:
+        obj: The object to draw.
+        pixels_per_cell: The pixel width and height of a discrete position.
+        border_width: The pixel width of the border that highlights object boundaries.
+    """
+    object_tiles = []
+
+    for cell in obj.cells:
+        has_neighbors = tuple(
+            (cell[0] + dc, cell[1] + dr) in obj.cells for dr, dc in _BORDER_OFFSETS
+        )
+        tile = _make_cell_tile(
+            obj.fill_color,
+            obj.border_color,
+            has_neighbors,
+            pixels_per_cell,
+            border_width,
+        )
+        object_tiles.append((cell, tile))
+
+    return object_tiles
+
+
+def _make_object_patch(
+    object_tiles: List[Tuple[Point, CellTile]], pixels_per_cell: int
+) -> ObjectPatch:
+    """Assembles the cell tiles of an object into a single image patch that covers
+    the bounding box of the object.
+
+    Args:
+        object_tiles: The (cell, tile) pairs of the object, as returned by
+            `_make_object_tiles`.
+        pixels_per_cell: The pixel width and height of a discrete position.
+    """
+    (min_x, min_y), (max_x, max_y) = _get_bounds(cell for cell, _ in object_tiles)
+    patch_shape = (
+        (max_y - min_y + 1) * pixels_per_cell,
+        (max_x - min_x + 1) * pixels_per_cell,
+    )
+    patch = np.zeros(patch_shape + (3,), np.uint8)
+    mask = np.zeros(patch_shape + (3,), bool)
+
+    for (x, y), (tile, tile_mask) in object_tiles:
+        r = (y - min_y) * pixels_per_cell
+        c = (x - min_x) * pixels_per_cell
+        patch[r : r + pixels_per_cell, c : c + pixels_per_cell] = tile
+        mask[r : r + pixels_per_cell, c : c + pixels_per_cell] = (
+            True if tile_mask is None else tile_mask
+        )
+
+    patch.flags.writeable = False
+    if mask.all():
+        return (min_x, min_y), patch, None
+
+    mask.flags.writeable = False
+    return (min_x, min_y), patch, mask
+
+
+def _draw_object_patch(
+    object_patch: ObjectPatch,
+    position: Point,
+    image: np.ndarray,
+    pixels_per_cell: int,
+) -> None:
+    """Draws a whole object into the given image with a single array copy.
+
+    Args:
+        object_patch: The patch of the object to draw, as returned by
+            `_make_object_patch`.
+        position: The (column, row) position of the object.
+        image: The image in which to draw the object. Modified in place.
+            Must have shape (height, width, 3) and type `uint8`.
+        pixels_per_cell: The pixel width and height of a discrete position.
+    """
+    (offset_x, offset_y), patch, mask = object_patch
+    r = (position[1] + offset_y) * pixels_per_cell
+    c = (position[0] + offset_x) * pixels_per_cell
+    patch_image = image[r : r + patch.shape[0], c : c + patch.shape[1]]
+    if mask is None:
+        patch_image[:] = patch
+    else:
+        np.copyto(patch_image, patch, where=mask)
 
 
 def _draw_object(
-    obj: PushWorldObject,
+    object_tiles: List[Tuple[Point, CellTile]],
     position: Point,
     image: np.ndarray,
     pixels_per_cell: int,
-    border_width: int,
+    cells: Optional[Set[Point]] = None,
 ) -> None:
-    """Draws the object into the given image.
+    """Draws an object into the given image.
 
     Args:
-        obj: The object to draw.
+        object_tiles: The (cell, tile) pairs of the object to draw, as returned by
+            `_make_object_tiles`.
         position: The (column, row) position of the object.
         image: The image in which to draw the object. Modified in place.
             Must have shape (height, width, 3) and type `uint8`.
         pixels_per_cell: The pixel width and height of a discrete position.
-        border_width: The pixel width of the border that highlights object boundaries.
+        cells: If not None, only the parts of the object that cover these (column,
+            row) positions are drawn.
     """
-    position = np.array(position)
-    border_offsets = [
-        (-1, 0),
-        (1, 0),
-        (0, -1),
-        (0, 1),
-        (-1, -1),
-        (-1, 1),
-        (1, -1),
-        (1, 1),
-    ]
-
-    # Draw the cells and borders
-    for cell in obj.cells:
-        c, r = (position + cell) * pixels_per_cell
-        if obj.fill_color is not None:
-            image[r : r + pixels_per_cell, c : c + pixels_per_cell] = obj.fill_color
-
-        for dr, dc in border_offsets:
-            if (cell[0] + dc, cell[1] + dr) not in obj.cells:
-                # The adjacent cell is empty, so draw a border
-                r1 = r + max(0, dr) * (pixels_per_cell - border_width)
-                r2 = (r1 + pixels_per_cell) if dr == 0 else (r1 + border_width)
-                c1 = c + max(0, dc) * (pixels_per_cell - border_width)
-                c2 = (c1 + pixels_per_cell) if dc == 0 else (c1 + border_width)
-                image[r1:r2, c1:c2] = obj.border_color
+    x, y = position
+
+    for (cell_x, cell_y), (tile, mask) in object_tiles:
+        if cells is not None and (x + cell_x, y + cell_y) not in cells:
+            continue
+        c = (x + cell_x) * pixels_per_cell
+        r = (y + cell_y) * pixels_per_cell
+        cell_image = image[r : r + pixels_per_cell, c : c + pixels_per_cell]
+        if mask is None:
+            cell_image[:] = tile
+        else:
+            np.copyto(cell_image, tile, where=mask)
@@ -12,7 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Dict, Generator, Optional, Tuple
+import json
+import os
+from typing import Dict, Generator, List, Optional, Tuple
 import numpy as np
 
 from pushworld.config import BENCHMARK_PUZZLES_PATH, PUZZLE_EXTENSION
@@ -22,6 +24,99 @@ from pushworld.puzzle import (
 )
 from pushworld.utils.filesystem import iter_files_with_extension
 
+def read_puzzle_dimensions(puzzle_file_path: str) -> Tuple[int, int]:
+    """Returns the (width, height) of the grid of cells in a PushWorld puzzle file,
+    excluding the outer walls.
+
+    This only reads the first line of the file and counts the remaining lines, which
+    is much cheaper than constructing a `PushWorldPuzzle`.
+    """
+    with open(puzzle_file_path, "r") as puzzle_file:
+        width = len(puzzle_file.readline().split())
+        height = 1 + sum(1 for _ in puzzle_file)
+
+    return width, height
+
+
+def load_puzzle_dimensions(
+    puzzle_path: str,
+    puzzle_file_paths: List[str],
+    manifest_path: Optional[str] = None,
+) -> Dict[str, Tuple[int, int]]:
+    """Returns the (width, height) of the grid of cells in each of the given puzzle
+    files, excluding the outer walls.
+
+    If `manifest_path` is not None, the dimensions are cached in that JSON file, so
+    that later calls only need to `stat` each puzzle instead of reading it. Every
+    entry stores the size and modification time of its puzzle file, and puzzles
+    that are missing from the manifest or have changed since it was written are
+    read with `read_puzzle_dimensions`. The manifest is then rewritten.
+
+    Args:
+        puzzle_path: The path of a PushWorld puzzle file or of a directory that
+            contains puzzle files, possibly nested in subdirectories.
+        puzzle_file_paths: The paths of puzzle files inside `puzzle_path`.
+        manifest_path: If not None, the path of the manifest file that caches the
+            dimensions. It is created if it does not exist. Puzzles are stored by
+            their paths relative to `puzzle_path` (or to the directory that
+            contains it, if it is a file), so the manifest remains valid if the
+            puzzles are moved together.
+
+    Returns:
+        A map from each path in `puzzle_file_paths` to the dimensions of the puzzle.
+    """
+    if manifest_path is None:
+        return {path: read_puzzle_dimensions(path) for path in puzzle_file_paths}
+
+    try:
+        with open(manifest_path, "r") as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        manifest = {}
+
+    if not os.path.isdir(puzzle_path):
+        puzzle_path = os.path.dirname(puzzle_path)
+
+    # Paths found in `puzzle_path` start with this prefix, which is much cheaper to
+    # strip than calling `os.path.relpath` for every puzzle.
+    prefix = os.path.join(puzzle_path, "")
+
+    dimensions = {}
+    updated_manifest = {}
+    for path in puzzle_file_paths:
+        if path.startswith(prefix):
+            relative_path = path[len(prefix) :]
+        else:
+            relative_path = os.path.relpath(path, puzzle_path)
+
+        stat = os.stat(path)
+        entry = manifest.get(relative_path)
+        if entry is not None and entry[2:] == [stat.st_size, stat.st_mtime_ns]:
+            width, height = entry[:2]
+        else:
+            width, height = read_puzzle_dimensions(path)
+        dimensions[path] = (width, height)
+        updated_manifest[relative_path] = [
+            width,
+            height,
+            stat.st_size,
+            stat.st_mtime_ns,
+        ]
+
+    if updated_manifest != manifest:
+        # Write to a temporary file first so that a concurrent reader never sees a
+        # partially written manifest.
+        temp_manifest_path = f"{manifest_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_manifest_path, "w") as manifest_file:
+                json.dump(updated_manifest, manifest_file)
+            os.replace(temp_manifest_path, manifest_path)
+        except OSError:
+            pass  # the manifest is only a cache, so the dimensions are still valid
+
+    return dimensions
+
+
 def get_max_puzzle_dimensions() -> Tuple[int, int]:
     """Returns the (max height, max width) of PushWorld puzzles in the
     `pushworld.config.BENCHMARK_PUZZLES_PATH` directory."""
@@ -31,12 +126,11 @@ def get_max_puzzle_dimensions() -> Tuple[int, int]:
     for puzzle_file_path in iter_files_with_extension(
         BENCHMARK_PUZZLES_PATH, PUZZLE_EXTENSION
     ):
-        with open(puzzle_file_path, "r") as puzzle_file:
-            lines = puzzle_file.readlines()
+        width, height = read_puzzle_dimensions(puzzle_file_path)
 
         # Add 2 for the outer walls
-        max_height = max(max_height, len(lines) + 2)
-        max_width = max(max_width, len(lines[0].strip().split()) + 2)
+        max_height = max(max_height, height + 2)
+        max_width = max(max_width, width + 2)
 
     return max_height, max_width
 
@@ -62,13 +156,10 @@ def render_observation_padded(
         values
         ranging from [0, 1].
     """
-    image = (
-        puzzle.render(
-            state,
-            border_width=border_width,
-            pixels_per_cell=pixels_per_cell,
-        ).astype(np.float32)
-        / 255
+    image = puzzle.render(
+        state,
+        border_width=border_width,
+        pixels_per_cell=pixels_per_cell,
     )
 
     # Pad the image to the correct size.
@@ -81,11 +172,20 @@ def render_observation_padded(
     half_height_padding = height_padding // 2
     half_width_padding = width_padding // 2
 
-    return np.pad(
+    # Scale the image directly into the padded observation, which avoids allocating
+    # intermediate `float32` images. The explicit `dtype` keeps the division in
+    # `float32` regardless of NumPy's scalar casting rules.
+    observation = np.zeros(
+        (max_cell_height * pixels_per_cell, max_cell_width * pixels_per_cell, 3),
+        dtype=np.float32,
+    )
+    np.divide(
         image,
-        pad_width=[
-            (half_height_padding, height_padding - half_height_padding),
-            (half_width_padding, width_padding - half_width_padding),
-            (0, 0),
+        255,
+        out=observation[
+            half_height_padding : half_height_padding + image.shape[0],
+            half_width_padding : half_width_padding + image.shape[1],
         ],
+        dtype=np.float32,
     )
+    return observation
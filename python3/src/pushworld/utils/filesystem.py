@@ -53,12 +53,27 @@ def iter_files_with_extension(
             )
 
     else:
-        # Not a file, so must be a directory.
-        for parent_directory_path, _, filenames in os.walk(file_or_directory_path):
-            for filename in filenames:
-                if filename.lower().endswith(extension):
-                    file_path = os.path.join(parent_directory_path, filename)
-                    yield file_path
+        # Not a file, so must be a directory. This is a top-down traversal in the
+        # same order as `os.walk`, but file types come from the cached
+        # `os.DirEntry` information, so no file is `stat`ed.
+        directories = [file_or_directory_path]
+        while directories:
+            try:
+                with os.scandir(directories.pop()) as entries:
+                    file_paths = []
+                    subdirectory_paths = []
+                    for entry in entries:
+                        if entry.is_dir():
+                            # Like `os.walk`, do not follow symbolic links.
+                            if not entry.is_symlink():
+                                subdirectory_paths.append(entry.path)
+                        elif entry.name.lower().endswith(extension):
+                            file_paths.append(entry.path)
+            except OSError:
+                continue  # unreadable or missing directories are skipped
+
+            yield from file_paths
+            directories.extend(reversed(subdirectory_paths))
 
 
 def map_files_with_extension(
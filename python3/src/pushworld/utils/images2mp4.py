@@ -100,6 +100,14 @@ def images2mp4(
                 "installed. See https://ffmpeg.org/"
             )
 
+    # Every frame is upsampled into this buffer, which is then written straight to
+    # the pipe. Each (upsample x upsample) block of `upsampled_blocks` views the
+    # pixels that repeat one pixel of the original frame.
+    upsampled_frame = np.empty((h, w, 3), images[0].dtype)
+    upsampled_blocks = upsampled_frame.reshape(
+        h // upsample, upsample, w // upsample, upsample, 3
+    )
+
     for frame in images:
         if color_axis == 0:
             # Transpose the color axis to the correct position
@@ -111,7 +119,7 @@ def images2mp4(
                 "channels."
             )
 
-        frame = frame.repeat(upsample, axis=0).repeat(upsample, axis=1)
-        proc.stdin.write(frame[:h, :w].tobytes())
+        upsampled_blocks[:] = frame[:, np.newaxis, :, np.newaxis, :]
+        proc.stdin.write(upsampled_frame)
 
     proc.stdin.close()
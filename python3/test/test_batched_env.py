@@ -0,0 +1,128 @@
+# Copyright 2022 DeepMind Technologies Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+from pushworld.batched_env import BatchedPushWorldEnv
+from pushworld.puzzle import AGENT_IDX, NUM_ACTIONS, Actions
+
+TEST_PUZZLES_PATH = os.path.join(os.path.split(__file__)[0], "puzzles")
+
+# Braindead puzzles with different dimensions, to test the observation padding.
+BRAINDEAD_PUZZLES = {
+    "small.pwp": "A . .\n. . G1\n",
+    "large.pwp": ". . . .\n. A . .\n. . . .\nG1 . . .\n",
+}
+
+
+def _check_batched_steps(env: BatchedPushWorldEnv, braindead: bool) -> None:
+    """Steps every environment in `env` with random actions and checks that each
+    one follows the transitions, rewards, and observations of its puzzle."""
+    random_generator = np.random.default_rng(0)
+
+    observations = env.reset()
+    assert observations.shape == (env.num_envs,) + env.observation_shape
+
+    for _ in range(50):
+        puzzles = list(env.puzzles)
+        states = list(env.states)
+        actions = random_generator.integers(NUM_ACTIONS, size=env.num_envs)
+        observations, rewards, terminated, truncated = env.step(actions)
+        assert not truncated.any()
+
+        for i, puzzle in enumerate(puzzles):
+            next_state = puzzle.get_next_state(states[i], int(actions[i]))
+            assert terminated[i] == puzzle.is_goal_state(next_state)
+            if terminated[i]:
+                assert rewards[i] == 10.0
+                continue
+
+            assert env.states[i] == next_state
+            assert rewards[i] == pytest.approx(
+                puzzle.count_achieved_goals(next_state)
+                - puzzle.count_achieved_goals(states[i])
+                - 0.01
+            )
+
+            width, height = puzzle.dimensions
+            if braindead:
+                expected = puzzle.render(next_state)
+            else:
+                # `PushWorldEnv` observes standard puzzles with `render_simple`.
+                expected = puzzle.render_simple(next_state)
+                # Goals are drawn over the agent, so only check an uncovered agent.
+                agent_x, agent_y = next_state[AGENT_IDX]
+                if (agent_x, agent_y) not in puzzle.goal_state:
+                    assert observations[i, agent_y, agent_x, 0] == 1
+            assert (observations[i, :height, :width] == expected).all()
+            assert not observations[i, height:].any()
+            assert not observations[i, :, width:].any()
+
+
+@pytest.mark.parametrize("braindead", [False, True])
+def test_batched_step(braindead: bool):
+    """Checks that every environment in a `BatchedPushWorldEnv` follows the
+    transitions, rewards, and observations of its puzzle."""
+    with tempfile.TemporaryDirectory() as puzzle_dir:
+        if braindead:
+            for filename, contents in BRAINDEAD_PUZZLES.items():
+                with open(os.path.join(puzzle_dir, filename), "w") as puzzle_file:
+                    puzzle_file.write(contents)
+            puzzle_path = puzzle_dir
+        else:
+            puzzle_path = os.path.join(TEST_PUZZLES_PATH, "trivial.pwp")
+
+        env = BatchedPushWorldEnv(puzzle_path, num_envs=8, braindead=braindead)
+        _check_batched_steps(env, braindead)
+
+
+@pytest.mark.parametrize("puzzle_name", ["multiple_goals.pwp", "is_goal_state.pwp", ""])
+def test_batched_step_puzzle_sizes(puzzle_name: str):
+    """Checks the observations of standard puzzles that are wider than they are
+    tall, taller than they are wide, and of many different sizes (the whole test
+    puzzle directory), which are padded to a common shape."""
+    env = BatchedPushWorldEnv(os.path.join(TEST_PUZZLES_PATH, puzzle_name), num_envs=16)
+    _check_batched_steps(env, braindead=False)
+
+
+def test_batched_truncation():
+    """Checks that environments are truncated and reset after `max_steps`."""
+    puzzle_file_path = os.path.join(TEST_PUZZLES_PATH, "trivial.pwp")
+    env = BatchedPushWorldEnv(puzzle_file_path, num_envs=2, max_steps=2)
+    initial_observations = env.reset().copy()
+
+    actions = np.array([Actions.LEFT, Actions.LEFT])
+    assert not env.step(actions)[3].any()
+    observations, _, terminated, truncated = env.step(actions)
+    assert truncated.all()
+    assert not terminated.any()
+    assert (observations == initial_observations).all()
+
+
+def test_batched_invalid_actions():
+    """Checks that `step` rejects malformed actions."""
+    puzzle_file_path = os.path.join(TEST_PUZZLES_PATH, "trivial.pwp")
+    env = BatchedPushWorldEnv(puzzle_file_path, num_envs=2)
+
+    with pytest.raises(RuntimeError):
+        env.step(np.zeros(2, dtype=int))
+
+    env.reset()
+    for actions in [[0], [0, NUM_ACTIONS], [0.0, 1.0]]:
+        with pytest.raises(ValueError):
+            env.step(np.array(actions))
@@ -0,0 +1,85 @@
+# Copyright 2022 DeepMind Technologies Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import shutil
+
+from pushworld.config import PUZZLE_EXTENSION
+from pushworld.puzzle import PushWorldPuzzle
+from pushworld.utils.env_utils import load_puzzle_dimensions
+from pushworld.utils.filesystem import iter_files_with_extension
+
+TEST_PUZZLES_PATH = os.path.join(os.path.split(__file__)[0], "puzzles")
+
+
+def test_load_puzzle_dimensions(tmp_path) -> None:
+    """Checks that `load_puzzle_dimensions` matches the dimensions of loaded puzzles,
+    both without a manifest and before and after the manifest is written."""
+    puzzle_path = str(tmp_path / "puzzles")
+    shutil.copytree(TEST_PUZZLES_PATH, puzzle_path)
+    puzzle_file_paths = list(iter_files_with_extension(puzzle_path, PUZZLE_EXTENSION))
+
+    expected = {}
+    for path in puzzle_file_paths:
+        width, height = PushWorldPuzzle(path).dimensions
+        expected[path] = (width - 2, height - 2)  # exclude the outer walls
+
+    # Nothing is written unless a manifest path is given.
+    puzzle_filenames = sorted(os.listdir(puzzle_path))
+    assert load_puzzle_dimensions(puzzle_path, puzzle_file_paths) == expected
+    assert sorted(os.listdir(puzzle_path)) == puzzle_filenames
+
+    manifest_path = str(tmp_path / "manifest.json")
+    assert (
+        load_puzzle_dimensions(puzzle_path, puzzle_file_paths, manifest_path)
+        == expected
+    )
+    with open(manifest_path) as manifest_file:
+        assert len(json.load(manifest_file)) == len(puzzle_file_paths)
+    assert (
+        load_puzzle_dimensions(puzzle_path, puzzle_file_paths, manifest_path)
+        == expected
+    )
+    assert sorted(os.listdir(puzzle_path)) == puzzle_filenames
+
+    # A single puzzle file can also use a manifest.
+    path = puzzle_file_paths[0]
+    assert load_puzzle_dimensions(path, [path], manifest_path) == {path: expected[path]}
+
+
+def test_load_puzzle_dimensions_modified_puzzle(tmp_path) -> None:
+    """Checks that `load_puzzle_dimensions` does not reuse the manifest entry of a
+    puzzle that was modified after the manifest was written."""
+    puzzle_path = str(tmp_path / "puzzles")
+    shutil.copytree(TEST_PUZZLES_PATH, puzzle_path)
+    puzzle_file_paths = list(iter_files_with_extension(puzzle_path, PUZZLE_EXTENSION))
+    manifest_path = str(tmp_path / "manifest.json")
+
+    dimensions = load_puzzle_dimensions(puzzle_path, puzzle_file_paths, manifest_path)
+
+    # Add a row of empty cells to one puzzle.
+    path = puzzle_file_paths[0]
+    width, height = dimensions[path]
+    with open(path) as puzzle_file:
+        contents = puzzle_file.read().rstrip("\n")
+    with open(path, "w") as puzzle_file:
+        puzzle_file.write(contents + "\n" + " ".join(["."] * width) + "\n")
+
+    dimensions[path] = (width, height + 1)
+    assert PushWorldPuzzle(path).dimensions == (width + 2, height + 3)
+    assert (
+        load_puzzle_dimensions(puzzle_path, puzzle_file_paths, manifest_path)
+        == dimensions
+    )
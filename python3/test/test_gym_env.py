@@ -15,6 +15,7 @@
 # The following assumes gym.__version__ == '0.19.0'
 
 import os
+import shutil
 
 import numpy as np
 import pytest
@@ -167,3 +168,88 @@ def test_reset():
     env = PushWorldEnv(TEST_PUZZLES_PATH)
     initial_states = set(tuple(env.reset()[0].flat) for _ in range(100))
     assert len(initial_states) > 1
+
+
+def test_reused_observation_buffer():
+    """Checks that `reset` and `step` render into a single array when `copy_obs` is
+    False."""
+    puzzle_file_path = os.path.join(TEST_PUZZLES_PATH, "trivial.pwp")
+    env = PushWorldEnv(puzzle_file_path, copy_obs=False)
+
+    o1, _ = env.reset()
+    initial_observation = o1.copy()
+    o2 = env.step(Actions.RIGHT)[0]
+    assert o1 is o2
+    assert not (o2 == initial_observation).all()
+
+    o3, _ = env.reset()
+    assert o3 is o1
+    assert (o3 == initial_observation).all()
+    assert o3 in env.observation_space
+
+
+def test_invalid_action():
+    """Checks that `step` rejects actions outside of the action space."""
+    puzzle_file_path = os.path.join(TEST_PUZZLES_PATH, "trivial.pwp")
+    env = PushWorldEnv(puzzle_file_path)
+    env.reset()
+
+    for action in [-1, env.action_space.n, 1.0, "1", np.array(1.0), np.array([1])]:
+        with pytest.raises(ValueError):
+            env.step(action)
+
+    # NumPy integer scalars and 0-d arrays are valid actions, as in `Discrete`.
+    for action in [np.int64(Actions.RIGHT), np.array(Actions.LEFT)]:
+        assert action in env.action_space
+        env.step(action)
+
+
+def test_no_observations():
+    """Checks that `reset` and `step` skip the observations when `return_obs` is
+    False, without changing rewards or terminations."""
+    puzzle_file_path = os.path.join(TEST_PUZZLES_PATH, "trivial.pwp")
+    env = PushWorldEnv(puzzle_file_path)
+    env_without_obs = PushWorldEnv(puzzle_file_path, return_obs=False)
+
+    assert env_without_obs.reset()[0] is None
+    env.reset()
+
+    for action in [Actions.LEFT, Actions.RIGHT, Actions.UP, Actions.RIGHT]:
+        observation, *transition = env.step(action)
+        observation_without_obs, *transition_without_obs = env_without_obs.step(action)
+        assert observation is not None
+        assert observation_without_obs is None
+        assert transition == transition_without_obs
+
+
+def test_reset_seed():
+    """Checks that seeding `reset` reproduces the sequence of selected puzzles."""
+    env = PushWorldEnv(TEST_PUZZLES_PATH, return_obs=False)
+
+    def reset_puzzle_names(seed):
+        names = []
+        for i in range(20):
+            env.reset(seed=seed if i == 0 else None)
+            names.append(env.current_puzzle.name)
+        return names
+
+    first = reset_puzzle_names(seed=5)
+    assert len(set(first)) > 1
+    assert reset_puzzle_names(seed=5) == first
+
+
+def test_dimensions_manifest(tmp_path):
+    """Checks that `PushWorldEnv` only caches puzzle dimensions in an explicitly
+    given manifest, and never in the puzzle directory."""
+    puzzle_path = str(tmp_path / "puzzles")
+    shutil.copytree(TEST_PUZZLES_PATH, puzzle_path)
+    puzzle_filenames = sorted(os.listdir(puzzle_path))
+
+    env = PushWorldEnv(puzzle_path)
+    assert sorted(os.listdir(puzzle_path)) == puzzle_filenames
+
+    manifest_path = str(tmp_path / "manifest.json")
+    cached_env = PushWorldEnv(puzzle_path, dimensions_manifest_path=manifest_path)
+    assert os.path.exists(manifest_path)
+    assert sorted(os.listdir(puzzle_path)) == puzzle_filenames
+    assert cached_env.observation_space == env.observation_space
@@ -15,7 +15,15 @@
 import os
 
 from pushworld.config import PUZZLE_EXTENSION
-from pushworld.puzzle import AGENT_IDX, Actions, PushWorldPuzzle
+from pushworld.puzzle import (
+    AGENT_IDX,
+    NUM_ACTIONS,
+    STATE_DTYPE,
+    Actions,
+    PushWorldPuzzle,
+    array_to_states,
+    states_to_array,
+)
 
 
 def _get_test_puzzle_file_path(puzzle_name: str) -> str:
@@ -98,6 +106,54 @@ def test_transitive_pushing() -> None:
     assert next_state == ((4, 2), (6, 1), (5, 1))
 
 
+def test_get_next_states() -> None:
+    """Checks that `get_next_states` and `get_successor_states` match
+    `get_next_state` for every state."""
+    for puzzle_name in [
+        "pushing",
+        "transitive_pushing",
+        "necessary_transitive_pushing1",
+        "shortest_path_tool",
+    ]:
+        puzzle = PushWorldPuzzle(_get_test_puzzle_file_path(puzzle_name))
+
+        # Collect reachable states, including states in which pushing is stopped
+        states = {puzzle.initial_state}
+        frontier = [puzzle.initial_state]
+        while frontier and len(states) < 500:
+            state = frontier.pop()
+            for action in range(NUM_ACTIONS):
+                next_state = puzzle.get_next_state(state, action)
+                if next_state not in states:
+                    states.add(next_state)
+                    frontier.append(next_state)
+        states = list(states)
+
+        # Equal positions are shared between states
+        positions = [position for state in states for position in state]
+        assert len(set(map(id, positions))) == len(set(positions))
+
+        state_array = states_to_array(states)
+        assert state_array.dtype == STATE_DTYPE
+        assert array_to_states(state_array) == states
+
+        for action in range(NUM_ACTIONS):
+            next_states = puzzle.get_next_states(state_array, action)
+            assert next_states.dtype == STATE_DTYPE
+            assert array_to_states(next_states) == [
+                puzzle.get_next_state(state, action) for state in states
+            ]
+
+        for state in states:
+            assert puzzle.get_successor_states(state) == [
+                puzzle.get_next_state(state, action) for action in range(NUM_ACTIONS)
+            ]
+
+        assert puzzle.are_goal_states(state_array).tolist() == [
+            puzzle.is_goal_state(state) for state in states
+        ]
+
+
 def test_goal_states() -> None:
     """Checks `PushWorldPuzzle.is_goal_state` and `count_achieved_goals`."""
     puzzle = PushWorldPuzzle(_get_test_puzzle_file_path("is_goal_state"))
@@ -269,3 +325,8 @@ def test_rendering() -> None:
         -8235536721686713717,
     ]
     assert image_hashes == [hash(tuple(image.flat)) for image in plan_images]
+
+    # The walls are drawn from a shared background, so modifying a returned image
+    # must not affect later renders of the same state.
+    initial_image[:] = 0
+    assert (puzzle.render(state) == plan_images[0]).all()
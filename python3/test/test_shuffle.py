@@ -0,0 +1,198 @@
+# Copyright 2022 DeepMind Technologies Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import errno
+import os
+import sys
+import tempfile
+
+from pushworld.data import shuffle
+from pushworld.data.shuffle import list_puzzle_files, shuffle_puzzles
+
+TEST_PUZZLES_PATH = os.path.join(os.path.split(__file__)[0], "puzzles")
+
+
+def _make_dataset(base_dir: str) -> None:
+    """Fills the `original` folder of a dataset with copies of the test puzzles."""
+    original_dir = os.path.join(base_dir, "original")
+    os.makedirs(original_dir)
+
+    for filename in os.listdir(TEST_PUZZLES_PATH):
+        with open(os.path.join(TEST_PUZZLES_PATH, filename)) as src:
+            contents = src.read()
+        for i in range(3):
+            with open(os.path.join(original_dir, f"{i}_{filename}"), "w") as dst:
+                dst.write(contents)
+
+    # Files without the puzzle extension are ignored.
+    with open(os.path.join(original_dir, "README.txt"), "w") as file:
+        file.write("not a puzzle")
+
+
+def test_shuffle_puzzles() -> None:
+    """Checks that every puzzle is copied unchanged into exactly one split."""
+    with tempfile.TemporaryDirectory() as base_dir:
+        _make_dataset(base_dir)
+        original_dir = os.path.join(base_dir, "original")
+        num_puzzles = len(list_puzzle_files(original_dir))
+
+        counts = shuffle_puzzles(
+            base_dir, train_percent=0.5, test_percent=0.3, archive_percent=0.2, seed=1
+        )
+        assert sum(counts.values()) == num_puzzles
+        assert counts["train"] == num_puzzles // 2
+
+        seen = set()
+        for split in ["train", "test", "archive"]:
+            filenames = list_puzzle_files(os.path.join(base_dir, split))
+            assert len(filenames) == counts[split]
+            for filename in filenames:
+                with open(os.path.join(original_dir, filename)) as original:
+                    with open(os.path.join(base_dir, split, filename)) as copy:
+                        assert original.read() == copy.read()
+            seen.update(filenames)
+
+        assert seen == set(list_puzzle_files(original_dir))
+
+
+def test_shuffle_puzzles_clears_previous_split() -> None:
+    """Checks that shuffling twice does not leave stale puzzles in the splits."""
+    with tempfile.TemporaryDirectory() as base_dir:
+        _make_dataset(base_dir)
+        num_puzzles = len(list_puzzle_files(os.path.join(base_dir, "original")))
+
+        first = shuffle_puzzles(base_dir, seed=1)
+
+        # A dangling link to a puzzle is also removed.
+        link_path = os.path.join(base_dir, "train", "link.pwp")
+        os.symlink(os.path.join(base_dir, "missing.pwp"), link_path)
+
+        second = shuffle_puzzles(base_dir, seed=2)
+        assert first == second
+        assert not os.path.lexists(link_path)
+
+        total = sum(
+            len(list_puzzle_files(os.path.join(base_dir, split)))
+            for split in ["train", "test", "archive"]
+        )
+        assert total == num_puzzles
+
+
+def test_shuffle_puzzles_normalizes_percentages(capsys) -> None:
+    """Checks that percentages are only normalized when they do not sum to 1."""
+    with tempfile.TemporaryDirectory() as base_dir:
+        _make_dataset(base_dir)
+
+        shuffle_puzzles(base_dir, 0.7, 0.2, 0.1, seed=1)
+        assert "Warning" not in capsys.readouterr().out
+
+        counts = shuffle_puzzles(base_dir, 2, 1, 1, seed=1)
+        assert "Warning" in capsys.readouterr().out
+        assert counts["train"] == sum(counts.values()) // 2
+
+
+def test_shuffle_puzzles_hardlink() -> None:
+    """Checks that puzzles are hard linked into the splits when requested."""
+    with tempfile.TemporaryDirectory() as base_dir:
+        _make_dataset(base_dir)
+        original_dir = os.path.join(base_dir, "original")
+
+        shuffle_puzzles(base_dir, seed=1, hardlink=True)
+
+        for split in ["train", "test", "archive"]:
+            for filename in list_puzzle_files(os.path.join(base_dir, split)):
+                assert os.path.samefile(
+                    os.path.join(original_dir, filename),
+                    os.path.join(base_dir, split, filename),
+                )
+
+
+def test_shuffle_puzzles_short_writes(monkeypatch) -> None:
+    """Checks that puzzles are copied completely when the kernel copy is unavailable
+    and `os.write` only writes part of each buffer."""
+    write = os.write
+    monkeypatch.setattr(shuffle, "_kernel_copy", lambda *args: False)
+    monkeypatch.setattr(os, "write", lambda fd, data: write(fd, data[:7]))
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        _make_dataset(base_dir)
+        original_dir = os.path.join(base_dir, "original")
+
+        shuffle_puzzles(base_dir, seed=1)
+
+        for split in ["train", "test", "archive"]:
+            for filename in list_puzzle_files(os.path.join(base_dir, split)):
+                with open(os.path.join(original_dir, filename)) as original:
+                    with open(os.path.join(base_dir, split, filename)) as copy:
+                        assert original.read() == copy.read()
+
+
+def test_shuffle_puzzles_without_sendfile_to_files(monkeypatch) -> None:
+    """Checks that puzzles are copied on platforms without `os.copy_file_range` where
+    `os.sendfile` only accepts sockets, as on macOS."""
+
+    def sendfile(*args):
+        raise OSError(errno.ENOTSOCK, os.strerror(errno.ENOTSOCK))
+
+    monkeypatch.delattr(os, "copy_file_range", raising=False)
+    monkeypatch.setattr(os, "sendfile", sendfile, raising=False)
+    for platform in ["darwin", "linux"]:
+        monkeypatch.setattr(sys, "platform", platform)
+
+        with tempfile.TemporaryDirectory() as base_dir:
+            _make_dataset(base_dir)
+            original_dir = os.path.join(base_dir, "original")
+
+            shuffle_puzzles(base_dir, seed=1)
+
+            for split in ["train", "test", "archive"]:
+                for filename in list_puzzle_files(os.path.join(base_dir, split)):
+                    with open(os.path.join(original_dir, filename)) as original:
+                        with open(os.path.join(base_dir, split, filename)) as copy:
+                            assert original.read() == copy.read()
+
+
+def test_shuffle_puzzles_without_dir_fd(monkeypatch) -> None:
+    """Checks that puzzles are copied byte for byte, with their timestamps, on
+    platforms that cannot open files relative to a directory, as on Windows."""
+
+    def unsupported(*args, **kwargs):
+        raise NotImplementedError
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        _make_dataset(base_dir)
+        original_dir = os.path.join(base_dir, "original")
+        with open(os.path.join(original_dir, "crlf.pwp"), "wb") as file:
+            file.write(b"A .\r\n. G\r\n")
+
+        # The temporary directory itself is removed with `os.open`, so only the
+        # shuffle runs without it.
+        with monkeypatch.context() as patch:
+            patch.setattr(os, "supports_dir_fd", set())
+            patch.setattr(os, "open", unsupported)
+            for name in ["readv", "copy_file_range", "sendfile"]:
+                patch.delattr(os, name, raising=False)
+
+            shuffle_puzzles(base_dir, seed=1, preserve_timestamps=True)
+
+        for split in ["train", "test", "archive"]:
+            for filename in list_puzzle_files(os.path.join(base_dir, split)):
+                original_path = os.path.join(original_dir, filename)
+                copy_path = os.path.join(base_dir, split, filename)
+                with open(original_path, "rb") as original:
+                    with open(copy_path, "rb") as copy:
+                        assert original.read() == copy.read()
+                assert (
+                    os.stat(original_path).st_mtime_ns == os.stat(copy_path).st_mtime_ns
+                )